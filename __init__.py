@@ -22,11 +22,15 @@ import asyncio
 import json
 import traceback
 import threading
-import importlib.util
+import concurrent.futures
+import importlib
+import pkgutil
+import stat
 import folder_paths # ComfyUI global
 from aiohttp import web
 import time # For time.sleep in periodic task wrapper
 import re # Added for finalize_upload_model_route for subfolder splitting
+import urllib.parse
 
 # import atexit # Option pour le futur
 
@@ -60,12 +64,28 @@ except ImportError:
     print("🔴 [Holaf-Init] 'nodes/holaf_nodes_manager.py' not found or incomplete. Nodes Manager features may fail.")
     nodes_manager_helper = None
 
+# Model scans, deep scans and deletes are slow, disk-bound jobs: keep them in their own small pool
+# so they can't saturate the default executor that other routes rely on.
+MODEL_WORK_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='holaf-scan')
+
 # --- Global Application Configuration ---
+EXTENSION_DIR = os.path.dirname(__file__)
+PROFILER_JS_PATH = os.path.join(EXTENSION_DIR, "js", "profiler", "holaf_profiler.js")
 CONFIG = {}
 
+_json_response = holaf_utils.json_response
+
 def reload_global_config():
     global CONFIG
     CONFIG = holaf_config.load_all_configs()
+    invalidate_settings_response()
+
+_SETTINGS_RESPONSE_BODY = None # Serialized /holaf/utilities/settings response, rebuilt after CONFIG changes
+
+def invalidate_settings_response():
+    """ Must be called whenever the live CONFIG is modified. """
+    global _SETTINGS_RESPONSE_BODY
+    _SETTINGS_RESPONSE_BODY = None
 
 # --- Initialization ---
 print("--- Initializing Holaf Utilities ---")
@@ -306,29 +326,29 @@ if profiler_engine:
     @routes.post("/holaf/profiler/context")
     async def profiler_set_context(request: web.Request):
         try:
-            data = await request.json()
+            data = await request.json(loads=holaf_utils.loads_json)
             profiler_engine.load_workflow_context(data)
-            return web.json_response({"status": "ok", "message": "Context loaded."})
+            return _json_response({"status": "ok", "message": "Context loaded."})
         except Exception as e:
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.get("/holaf/profiler/context")
     async def profiler_get_context(request: web.Request):
         try:
             nodes = profiler_engine.get_context_for_frontend()
-            return web.json_response({"nodes": nodes})
+            return _json_response({"nodes": nodes})
         except Exception as e:
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.post("/holaf/profiler/run-start")
     async def profiler_run_start(request: web.Request):
         try:
-            data = await request.json()
+            data = await request.json(loads=holaf_utils.loads_json)
             name = data.get("name", "Untitled Run")
             run_id = profiler_engine.start_run(name=name)
-            return web.json_response({"status": "ok", "run_id": run_id})
+            return _json_response({"status": "ok", "run_id": run_id})
         except Exception as e:
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.post("/holaf/profiler/run-stop")
     async def profiler_stop_run(request: web.Request):
@@ -337,9 +357,9 @@ if profiler_engine:
             # (e.g. via a terminal event in the send_sync hook), is_profiling
             # is already False and this call is a no-op.
             profiler_engine.stop_run()
-            return web.json_response({"status": "ok", "message": "Profiling run stopped."})
+            return _json_response({"status": "ok", "message": "Profiling run stopped."})
         except Exception as e:
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.get("/holaf/profiler/run/{run_id}")
     async def profiler_get_run_data(request: web.Request):
@@ -347,10 +367,10 @@ if profiler_engine:
             run_id = request.match_info['run_id']
             # Access DB directly via engine as a shortcut
             steps = profiler_engine.db.get_run_steps(run_id)
-            return web.json_response({"steps": steps})
+            return _json_response({"steps": steps})
         except Exception as e:
             print(f"🔴 [Profiler] Error fetching run: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
             
     # --- NEW: Standalone Profiler View Route ---
     @routes.get("/holaf/profiler/view")
@@ -362,7 +382,7 @@ if profiler_engine:
     async def profiler_js_force_mime(request: web.Request):
         try:
             # FIX: Pointing to 'js/profiler/holaf_profiler.js'
-            js_path = os.path.join(os.path.dirname(__file__), "js", "profiler", "holaf_profiler.js")
+            js_path = PROFILER_JS_PATH
             if not os.path.exists(js_path):
                  return web.Response(status=404, text=f"JS file not found at: {js_path}")
             
@@ -406,10 +426,10 @@ if profiler_engine:
             limit = int(request.query.get('limit', 50))
             offset = int(request.query.get('offset', 0))
             runs = profiler_engine.db.list_runs(limit=limit, offset=offset)
-            return web.json_response({"runs": runs})
+            return _json_response({"runs": runs})
         except Exception as e:
             print(f"🔴 [Profiler] Error listing runs: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.get("/holaf/profiler/run/{run_id}/meta")
     async def profiler_get_run_meta(request: web.Request):
@@ -417,35 +437,35 @@ if profiler_engine:
             run_id = request.match_info['run_id']
             run = profiler_engine.db.get_run(run_id)
             if run is None:
-                return web.json_response({"error": "Run not found"}, status=404)
-            return web.json_response({"run": run})
+                return _json_response({"error": "Run not found"}, status=404)
+            return _json_response({"run": run})
         except Exception as e:
             print(f"🔴 [Profiler] Error fetching run meta: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.patch("/holaf/profiler/run/{run_id}/comment")
     async def profiler_update_run_comment(request: web.Request):
         try:
             run_id = request.match_info['run_id']
-            data = await request.json()
+            data = await request.json(loads=holaf_utils.loads_json)
             comment = data.get('comment', '')
             profiler_engine.db.update_run_comment(run_id, comment)
-            return web.json_response({"status": "ok"})
+            return _json_response({"status": "ok"})
         except Exception as e:
             print(f"🔴 [Profiler] Error updating comment: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.patch("/holaf/profiler/run/{run_id}/output")
     async def profiler_update_run_output(request: web.Request):
         try:
             run_id = request.match_info['run_id']
-            data = await request.json()
+            data = await request.json(loads=holaf_utils.loads_json)
             path = data.get('path', '')
             profiler_engine.db.update_run_output(run_id, path)
-            return web.json_response({"status": "ok"})
+            return _json_response({"status": "ok"})
         except Exception as e:
             print(f"🔴 [Profiler] Error updating output: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.get("/holaf/profiler/run/{run_id}/workflow")
     async def profiler_get_run_workflow(request: web.Request):
@@ -453,34 +473,34 @@ if profiler_engine:
             run_id = request.match_info['run_id']
             workflow_json = profiler_engine.db.get_workflow_json(run_id)
             if workflow_json is None:
-                return web.json_response({"error": "No workflow found"}, status=404)
+                return _json_response({"error": "No workflow found"}, status=404)
             # workflow_json is a JSON string; return it parsed as a JSON object
             try:
                 parsed = json.loads(workflow_json)
-                return web.json_response({"workflow": parsed})
+                return _json_response({"workflow": parsed})
             except (ValueError, TypeError):
-                return web.json_response({"workflow": workflow_json})
+                return _json_response({"workflow": workflow_json})
         except Exception as e:
             print(f"🔴 [Profiler] Error fetching workflow: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.delete("/holaf/profiler/run/{run_id}")
     async def profiler_delete_run(request: web.Request):
         try:
             run_id = request.match_info['run_id']
             profiler_engine.db.delete_run(run_id)
-            return web.json_response({"status": "ok"})
+            return _json_response({"status": "ok"})
         except Exception as e:
             print(f"🔴 [Profiler] Error deleting run: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.post("/holaf/profiler/compare")
     async def profiler_compare_runs(request: web.Request):
         try:
-            data = await request.json()
+            data = await request.json(loads=holaf_utils.loads_json)
             run_ids = data.get('run_ids', [])
             if not run_ids:
-                return web.json_response({"error": "No run_ids provided"}, status=400)
+                return _json_response({"error": "No run_ids provided"}, status=400)
 
             result = []
             for run_id in run_ids:
@@ -493,10 +513,10 @@ if profiler_engine:
                 })
 
             steps = profiler_engine.db.get_steps_for_comparison(run_ids)
-            return web.json_response({"runs": result, "steps": steps})
+            return _json_response({"runs": result, "steps": steps})
         except Exception as e:
             print(f"🔴 [Profiler] Error comparing runs: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
 # --- NEW ROUTE: Standalone Gallery View ---
 @routes.get("/holaf/view")
@@ -511,28 +531,32 @@ async def comparer_view_route(request: web.Request):
 # Shared/Utility Routes
 @routes.get("/holaf/utilities/settings")
 async def holaf_get_all_settings_route(request: web.Request):
-    current_live_config = CONFIG # Use the live global CONFIG
-    password_is_set = current_live_config.get('password_hash') is not None
-    response_data = {
-        "password_is_set": password_is_set,
-        "TerminalUI": current_live_config.get('ui_terminal'),
-        "ModelManagerUI": current_live_config.get('ui_model_manager'),
-        "ImageViewerUI": current_live_config.get('ui_image_viewer'),
-        "NodesManagerUI": current_live_config.get('ui_nodes_manager'),
-        "SystemMonitor": current_live_config.get('monitor')
-    }
-    return web.json_response(response_data)
+    global _SETTINGS_RESPONSE_BODY
+    body = _SETTINGS_RESPONSE_BODY
+    if body is None:
+        current_live_config = CONFIG # Use the live global CONFIG
+        password_is_set = current_live_config.get('password_hash') is not None
+        response_data = {
+            "password_is_set": password_is_set,
+            "TerminalUI": current_live_config.get('ui_terminal'),
+            "ModelManagerUI": current_live_config.get('ui_model_manager'),
+            "ImageViewerUI": current_live_config.get('ui_image_viewer'),
+            "NodesManagerUI": current_live_config.get('ui_nodes_manager'),
+            "SystemMonitor": current_live_config.get('monitor')
+        }
+        body = _SETTINGS_RESPONSE_BODY = holaf_utils.dumps_json_bytes(response_data)
+    return web.Response(body=body, content_type='application/json')
 
 @routes.post("/holaf/utilities/save-all-settings")
 async def holaf_save_all_settings_route(request: web.Request):
     try:
-        data = await request.json()
+        data = await request.json(loads=holaf_utils.loads_json)
         await holaf_config.save_bulk_settings_to_config(data)
         reload_global_config() # Reload to reflect changes in the live CONFIG
-        return web.json_response({"status": "ok", "message": "All settings saved."})
+        return _json_response({"status": "ok", "message": "All settings saved."})
     except Exception as e:
         print(f"🔴 [Holaf-Init] Error saving all settings: {e}"); traceback.print_exc()
-        return web.json_response({"status": "error", "message": str(e)}, status=500)
+        return _json_response({"status": "error", "message": str(e)}, status=500)
 
 @routes.post("/holaf/utilities/restart")
 async def holaf_restart_server_route(request: web.Request):
@@ -541,7 +565,10 @@ async def holaf_restart_server_route(request: web.Request):
 # Terminal Routes
 @routes.post("/holaf/terminal/set-password")
 async def holaf_terminal_set_password_route(request: web.Request):
-    return await holaf_terminal.set_password_route(request, CONFIG)
+    try:
+        return await holaf_terminal.set_password_route(request, CONFIG)
+    finally:
+        invalidate_settings_response() # password_is_set may have changed
 
 @routes.post("/holaf/terminal/auth")
 async def holaf_terminal_auth_route(request: web.Request):
@@ -551,49 +578,82 @@ async def holaf_terminal_auth_route(request: web.Request):
 async def holaf_terminal_websocket_route(request: web.Request):
     return await holaf_terminal.websocket_handler(request, CONFIG)
 
+# (save-settings payload key, type used for the live CONFIG value)
+TERMINAL_UI_SETTING_TYPES = (('theme', str), ('font_size', int),
+                             ('panel_width', int), ('panel_height', int),
+                             ('panel_is_fullscreen', bool))
+MODEL_MANAGER_UI_SETTING_TYPES = (('theme', str), ('panel_width', int), ('panel_height', int),
+                                  ('filter_type', str), ('filter_search_text', str),
+                                  ('sort_column', str), ('sort_order', str), ('zoom_level', float),
+                                  ('panel_is_fullscreen', bool))
+
+# Same types holaf_config gives these ImageViewerUI keys on load (getint / getboolean / get).
+IMAGE_VIEWER_UI_SETTING_TYPES = (('panel_is_fullscreen', holaf_config.to_config_bool),
+                                 ('thumbnail_fit', str), ('thumbnail_size', int), ('theme', str),
+                                 ('export_format', str), ('export_include_meta', holaf_config.to_config_bool),
+                                 ('export_meta_method', str), ('search_text', str),
+                                 ('search_scope_name', holaf_config.to_config_bool),
+                                 ('search_scope_prompt', holaf_config.to_config_bool),
+                                 ('search_scope_workflow', holaf_config.to_config_bool),
+                                 ('workflow_filter_internal', holaf_config.to_config_bool),
+                                 ('workflow_filter_external', holaf_config.to_config_bool))
+
+def _apply_ui_settings(data, setting_types, updates, live_settings):
+    """ Copies typed UI settings and panel_x/panel_y from a save-settings payload into INI `updates` and the live CONFIG section. """
+    live_values = {} # Converted first, so a bad value leaves CONFIG untouched
+    for key, value_type in setting_types:
+        if key in data:
+            val = data[key]
+            # JSON already delivers most values with the right type; only convert the rest.
+            live_values[key] = val if type(val) is value_type else value_type(val)
+            updates[key] = val if type(val) is str else str(val)
+    for key_pos in ('panel_x', 'panel_y'):
+        if key_pos in data:
+            val = data[key_pos]
+            live_values[key_pos] = None if val is None else int(val)
+            updates[key_pos] = None if val is None else str(val) # None removes the option
+    if live_settings: live_settings.update(live_values)
+
 @routes.post("/holaf/terminal/save-settings")
 async def holaf_terminal_save_ui_settings_route(request: web.Request):
     try:
-        data = await request.json()
-        async with holaf_config.CONFIG_LOCK:
-            config_parser_obj = holaf_config.get_config_parser()
-            section = 'TerminalUI'
-            if not config_parser_obj.has_section(section): config_parser_obj.add_section(section)
-
-            for key, value_type in [('theme', str), ('font_size', int),
-                                    ('panel_width', int), ('panel_height', int),
-                                    ('panel_is_fullscreen', bool)]:
-                if key in data:
-                    val = data[key]
-                    config_parser_obj.set(section, key, str(val))
-                    if CONFIG.get('ui_terminal'): CONFIG['ui_terminal'][key] = value_type(val)
-
-            for key_pos in ['panel_x', 'panel_y']:
-                 if key_pos in data:
-                    val = data[key_pos]
-                    if val is not None:
-                        config_parser_obj.set(section, key_pos, str(val))
-                        if CONFIG.get('ui_terminal'): CONFIG['ui_terminal'][key_pos] = int(val)
-                    else:
-                        if config_parser_obj.has_option(section, key_pos): config_parser_obj.remove_option(section, key_pos)
-                        if CONFIG.get('ui_terminal'): CONFIG['ui_terminal'][key_pos] = None
-
-            with open(holaf_config.get_config_path(), 'w') as cf: config_parser_obj.write(cf)
-        reload_global_config()
-        return web.json_response({"status": "ok", "message": "Terminal UI settings saved."})
+        data = await request.json(loads=holaf_utils.loads_json)
+        section = 'TerminalUI'
+        updates = {}
+        _apply_ui_settings(data, TERMINAL_UI_SETTING_TYPES, updates, CONFIG.get('ui_terminal'))
+
+        # Live CONFIG is already up to date; the disk write is debounced.
+        invalidate_settings_response()
+        holaf_config.queue_settings(section, updates)
+        return _json_response({"status": "ok", "message": "Terminal UI settings saved."})
     except Exception as e:
         print(f"🔴 Error saving Terminal UI settings: {e}"); traceback.print_exc()
-        return web.json_response({"status": "error", "message": str(e)}, status=500)
+        return _json_response({"status": "error", "message": str(e)}, status=500)
 
 # Model Manager Routes (thin wrappers around model_manager_helper)
-MODEL_TYPES_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'model_types.json')
+MODEL_TYPES_CONFIG_PATH = os.path.join(EXTENSION_DIR, 'model_types.json')
+_MODEL_TYPES_CONFIG_CACHE = None # (model_types.json mtime_ns, serialized response body)
+
+def _get_model_types_config_body():
+    """ Returns the raw model_types.json bytes, re-reading the file only when its mtime changes. Raises FileNotFoundError. """
+    global _MODEL_TYPES_CONFIG_CACHE
+    mtime_ns = os.stat(MODEL_TYPES_CONFIG_PATH).st_mtime_ns
+    cached = _MODEL_TYPES_CONFIG_CACHE
+    if cached is None or cached[0] != mtime_ns:
+        with open(MODEL_TYPES_CONFIG_PATH, 'rb') as f:
+            raw = f.read()
+        holaf_utils.loads_json(raw) # Validate only; the file is already JSON, serve it as-is
+        cached = (mtime_ns, raw)
+        _MODEL_TYPES_CONFIG_CACHE = cached
+    return cached[1]
 
 @routes.get("/holaf/models/config")
 async def get_model_types_config_route(request: web.Request):
-    if not os.path.exists(MODEL_TYPES_CONFIG_PATH):
-        return web.json_response({"error": "model_types.json not found"}, status=404)
-    with open(MODEL_TYPES_CONFIG_PATH, 'r', encoding='utf-8') as f:
-        return web.json_response(json.load(f))
+    try:
+        body = _get_model_types_config_body()
+    except FileNotFoundError:
+        return _json_response({"error": "model_types.json not found"}, status=404)
+    return web.Response(body=body, content_type='application/json')
 
 @routes.post("/holaf/models/upload-chunk")
 async def upload_model_chunk_route(request: web.Request):
@@ -607,22 +667,22 @@ async def upload_model_chunk_route(request: web.Request):
             chunk_idx = int(chunk_idx)
             if chunk_idx < 0: raise ValueError
         except (ValueError, TypeError):
-            return web.json_response({"status": "error", "message": "chunk_index must be a non-negative integer."}, status=400)
+            return _json_response({"status": "error", "message": "chunk_index must be a non-negative integer."}, status=400)
         if not all([upload_id, file_chunk]):
-            return web.json_response({"status": "error", "message": "Missing required fields."}, status=400)
+            return _json_response({"status": "error", "message": "Missing required fields."}, status=400)
         chunk_path = os.path.join(holaf_utils.TEMP_UPLOAD_DIR, f"{upload_id}-{chunk_idx}.chunk")
         if not os.path.normpath(chunk_path).startswith(os.path.normpath(holaf_utils.TEMP_UPLOAD_DIR)):
-             return web.json_response({"status": "error", "message": "Invalid chunk path."}, status=400)
+             return _json_response({"status": "error", "message": "Invalid chunk path."}, status=400)
         with open(chunk_path, 'wb') as f: f.write(file_chunk.file.read())
-        return web.json_response({"status": "ok", "message": f"Chunk {chunk_idx} received."})
+        return _json_response({"status": "ok", "message": f"Chunk {chunk_idx} received."})
     except Exception as e:
         print(f"🔴 Error processing chunk: {e}"); traceback.print_exc()
-        return web.json_response({"status": "error", "message": str(e)}, status=500)
+        return _json_response({"status": "error", "message": str(e)}, status=500)
 
 @routes.post("/holaf/models/finalize-upload")
 async def finalize_upload_model_route(request: web.Request):
     try:
-        data = await request.json()
+        data = await request.json(loads=holaf_utils.loads_json)
         upload_id = holaf_utils.sanitize_upload_id(data.get('upload_id'))
         filename_orig = data.get('filename')
         total_chunks = data.get('total_chunks')
@@ -634,7 +694,7 @@ async def finalize_upload_model_route(request: web.Request):
 
         # MODIFIED: Update validation to remove checksum
         if not all([upload_id, filename_orig, total_chunks, dest_type, expected_size]):
-            return web.json_response({"status": "error", "message": "Missing fields, including expected size."}, status=400)
+            return _json_response({"status": "error", "message": "Missing fields, including expected size."}, status=400)
 
         # Validate numeric fields
         try:
@@ -642,19 +702,19 @@ async def finalize_upload_model_route(request: web.Request):
             if total_chunks <= 0 or total_chunks > 10000:
                 raise ValueError
         except (ValueError, TypeError):
-            return web.json_response({"status": "error", "message": "total_chunks must be a positive integer (max 10000)."}, status=400)
+            return _json_response({"status": "error", "message": "total_chunks must be a positive integer (max 10000)."}, status=400)
         try:
             expected_size = int(expected_size)
             if expected_size < 0:
                 raise ValueError
         except (ValueError, TypeError):
-            return web.json_response({"status": "error", "message": "expected_size must be a non-negative integer."}, status=400)
+            return _json_response({"status": "error", "message": "expected_size must be a non-negative integer."}, status=400)
 
         filename = holaf_utils.sanitize_filename(filename_orig)
-        if not filename: return web.json_response({"status": "error", "message": "Invalid filename."}, status=400)
+        if not filename: return _json_response({"status": "error", "message": "Invalid filename."}, status=400)
 
         base_paths = folder_paths.get_folder_paths(dest_type)
-        if not base_paths: return web.json_response({"error": f"Invalid dest type '{dest_type}'"}, status=400)
+        if not base_paths: return _json_response({"error": f"Invalid dest type '{dest_type}'"}, status=400)
 
         # Use re.split for subfolder to handle both / and \
         final_subfolder_parts = [p for p in map(holaf_utils.sanitize_directory_component, re.split(r'[/\\]', subfolder)) if p]
@@ -665,121 +725,109 @@ async def finalize_upload_model_route(request: web.Request):
         rel_save_path = os.path.relpath(final_save_path, comfy_base).replace(os.sep, '/')
 
         if model_manager_helper and not model_manager_helper.is_path_safe(rel_save_path, is_directory_model=False):
-             return web.json_response({"status": "error", "message": "Save path outside allowed model dirs."}, status=403)
+             return _json_response({"status": "error", "message": "Save path outside allowed model dirs."}, status=403)
         if os.path.exists(final_save_path):
-            return web.json_response({"status": "error", "message": "File already exists."}, status=409)
+            return _json_response({"status": "error", "message": "File already exists."}, status=409)
+
+        loop = asyncio.get_running_loop()
 
         def on_assembly_done():
+            # Runs in the executor thread: schedule the rescan on the event loop instead of
+            # spawning a Timer thread, and run it on the shared executor.
             if model_manager_helper and hasattr(model_manager_helper, 'scan_and_update_db'):
-                threading.Timer(1.0, model_manager_helper.scan_and_update_db).start()
+                loop.call_soon_threadsafe(loop.call_later, 1.0, loop.run_in_executor,
+                                          MODEL_WORK_EXECUTOR, model_manager_helper.scan_and_update_db)
 
-        loop = asyncio.get_running_loop()
         # MODIFIED: Pass only expected_size to the assembly function
         await loop.run_in_executor(None, holaf_utils.assemble_chunks_blocking,
                                    final_save_path, upload_id, total_chunks, on_assembly_done,
                                    expected_size)
-        return web.json_response({"status": "ok", "message": f"Finalization for '{filename}' started."})
+        return _json_response({"status": "ok", "message": f"Finalization for '{filename}' started."})
     except Exception as e:
         print(f"🔴 Error finalizing upload: {e}"); traceback.print_exc()
-        return web.json_response({"status": "error", "message": str(e)}, status=500)
+        return _json_response({"status": "error", "message": str(e)}, status=500)
 
 if model_manager_helper:
     @routes.get("/holaf/models")
     async def get_models_route(request: web.Request):
         try:
             models = model_manager_helper.get_all_models_from_db()
-            return web.json_response(models)
+            return _json_response(models)
         except Exception as e:
             print(f"🔴 [MM] Error fetching models: {e}"); traceback.print_exc()
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.post("/holaf/models/deep-scan-local")
     async def model_deep_scan_route(request: web.Request):
         try:
-            data = await request.json()
+            data = await request.json(loads=holaf_utils.loads_json)
             paths = data.get("paths")
             if not paths or not isinstance(paths, list):
-                return web.json_response({"error": "'paths' list required."}, status=400)
+                return _json_response({"error": "'paths' list required."}, status=400)
             loop = asyncio.get_running_loop()
-            results = await loop.run_in_executor(None, model_manager_helper.process_deep_scan_request, paths)
-            return web.json_response({"status": "ok", "details": results})
+            results = await loop.run_in_executor(MODEL_WORK_EXECUTOR, model_manager_helper.process_deep_scan_request, paths)
+            return _json_response({"status": "ok", "details": results})
         except Exception as e:
             print(f"🔴 [MM] Error deep scanning: {e}"); traceback.print_exc()
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.post("/holaf/models/delete") # This is for Model Manager, distinct from Image Viewer delete
     async def delete_model_route(request: web.Request):
         try:
-            data = await request.json()
+            data = await request.json(loads=holaf_utils.loads_json)
             paths = data.get("paths", [])
             if not paths or not isinstance(paths, list):
-                return web.json_response({"error": "'paths' list required."}, status=400)
+                return _json_response({"error": "'paths' list required."}, status=400)
             
             loop = asyncio.get_running_loop()
-            results = await loop.run_in_executor(None, model_manager_helper.delete_models_from_db_and_disk, paths)
-            return web.json_response(results)
+            results = await loop.run_in_executor(MODEL_WORK_EXECUTOR, model_manager_helper.delete_models_from_db_and_disk, paths)
+            return _json_response(results)
         except Exception as e:
             print(f"🔴 [MM] Error deleting models: {e}"); traceback.print_exc()
-            return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"error": str(e)}, status=500)
 
     @routes.post("/holaf/model-manager/save-settings")
     async def model_manager_save_ui_settings_route(request: web.Request):
         try:
-            data = await request.json()
-            async with holaf_config.CONFIG_LOCK:
-                cp = holaf_config.get_config_parser()
-                s = 'ModelManagerUI'
-                if not cp.has_section(s): cp.add_section(s)
-
-                map_cfg = {'theme': str, 'panel_width': int, 'panel_height': int,
-                           'filter_type': str, 'filter_search_text': str,
-                           'sort_column': str, 'sort_order': str, 'zoom_level': float,
-                           'panel_is_fullscreen': bool}
-                for k, v_type in map_cfg.items():
-                    if k in data:
-                        val = data[k]
-                        cp.set(s, k, str(val))
-                        if CONFIG.get('ui_model_manager'): CONFIG['ui_model_manager'][k] = v_type(val)
-                for k_pos in ['panel_x', 'panel_y']:
-                    if k_pos in data:
-                        val = data[k_pos]
-                        if val is not None:
-                            cp.set(s, k_pos, str(val))
-                            if CONFIG.get('ui_model_manager'): CONFIG['ui_model_manager'][k_pos] = int(val)
-                        else:
-                            if cp.has_option(s,k_pos): cp.remove_option(s,k_pos)
-                            if CONFIG.get('ui_model_manager'): CONFIG['ui_model_manager'][k_pos] = None
-                with open(holaf_config.get_config_path(), 'w') as cf: cp.write(cf)
-            reload_global_config()
-            return web.json_response({"status": "ok", "message": "Model Manager UI settings saved."})
+            data = await request.json(loads=holaf_utils.loads_json)
+            s = 'ModelManagerUI'
+            updates = {}
+            _apply_ui_settings(data, MODEL_MANAGER_UI_SETTING_TYPES, updates, CONFIG.get('ui_model_manager'))
+            # Live CONFIG is already up to date; the disk write is debounced.
+            invalidate_settings_response()
+            holaf_config.queue_settings(s, updates)
+            return _json_response({"status": "ok", "message": "Model Manager UI settings saved."})
         except Exception as e:
             print(f"🔴 Error saving MM UI settings: {e}"); traceback.print_exc()
-            return web.json_response({"status": "error", "message": str(e)}, status=500)
+            return _json_response({"status": "error", "message": str(e)}, status=500)
 
-    @routes.post("/holaf/models/download-chunk")
-    async def download_model_chunk_route(request: web.Request):
+    @routes.get("/holaf/models/download")
+    async def download_model_route(request: web.Request):
+        # FileResponse sends the file with sendfile(2) where the transport allows it (no user-space
+        # copy of multi-GB checkpoints) and honors Range requests, so the panel's parallel chunk
+        # workers and resumed downloads only transfer the bytes they ask for.
         try:
-            data = await request.json()
-            path_canon = data.get("path")
-            chunk_index = int(data.get("chunk_index"))
-            chunk_size = int(data.get("chunk_size"))
-
+            path_canon = request.query.get("path")
+            if not path_canon:
+                return web.Response(status=400, text="'path' query parameter required.")
             if not model_manager_helper.is_path_safe(path_canon, is_directory_model=False):
                 return web.Response(status=403, text="Access forbidden.")
 
-            comfy_base = os.path.normpath(folder_paths.base_path)
-            is_abs = path_canon.startswith('/') or (os.name == 'nt' and len(path_canon) > 1 and path_canon[1] == ':')
-            abs_model_path = os.path.normpath(path_canon if is_abs else os.path.join(comfy_base, path_canon))
-
-            if not os.path.isfile(abs_model_path):
+            abs_model_path = model_manager_helper.resolve_client_model_path(path_canon)
+            try:
+                st = os.stat(abs_model_path) # One stat for existence and type
+            except FileNotFoundError:
                 return web.Response(status=404, text="Model file not found.")
-
-            offset = chunk_index * chunk_size
-            chunk_data = await holaf_utils.read_file_chunk(abs_model_path, offset, chunk_size)
-            if chunk_data is None: raise IOError("File could not be read.")
-            return web.Response(body=chunk_data, content_type='application/octet-stream')
+            if not stat.S_ISREG(st.st_mode):
+                return web.Response(status=400, text="Path is not a file.")
+
+            filename = os.path.basename(abs_model_path)
+            return web.FileResponse(abs_model_path, chunk_size=1 << 20, headers={
+                "Content-Type": "application/octet-stream",
+                "Content-Disposition": f"attachment; filename*=UTF-8''{urllib.parse.quote(filename)}",
+            })
         except Exception as e:
-            print(f"🔴 [MM] Error downloading chunk: {e}"); traceback.print_exc()
+            print(f"🔴 [MM] Error downloading model: {e}"); traceback.print_exc()
             return web.Response(status=500, text=str(e))
 
 # --- Image Viewer Routes ---
@@ -801,7 +849,7 @@ async def iv_get_metadata_route(r): return await holaf_image_viewer_backend.get_
 # --- MODIFICATION START: Add route for checking last update time ---
 @routes.get("/holaf/images/last-update-time")
 async def iv_get_last_update_time_route(request: web.Request):
-    return web.json_response({"last_update": holaf_image_viewer_backend.logic.LAST_DB_UPDATE_TIME})
+    return _json_response({"last_update": holaf_image_viewer_backend.logic.LAST_DB_UPDATE_TIME})
 # --- MODIFICATION END ---
 
 
@@ -881,60 +929,54 @@ async def iv_thumbnail_diagnose_route(r): return await holaf_image_viewer_backen
 @routes.post("/holaf/image-viewer/save-settings")
 async def image_viewer_save_ui_settings_route(request: web.Request):
     try:
-        data = await request.json()
-        async with holaf_config.CONFIG_LOCK:
-            cp = holaf_config.get_config_parser()
-            s = 'ImageViewerUI'
-            if not cp.has_section(s): cp.add_section(s)
-
-            # Consolidate panel dimension keys
-            pos_x = data.get('panel_x', data.get('x'))
-            pos_y = data.get('panel_y', data.get('y'))
-            width = data.get('panel_width', data.get('width'))
-            height = data.get('panel_height', data.get('height'))
-
-            # Handle panel position and size
-            if pos_x is not None: cp.set(s, 'panel_x', str(int(pos_x)))
-            else:
-                if cp.has_option(s, 'panel_x'): cp.remove_option(s, 'panel_x')
-            if pos_y is not None: cp.set(s, 'panel_y', str(int(pos_y)))
-            else:
-                if cp.has_option(s, 'panel_y'): cp.remove_option(s, 'panel_y')
-            if width is not None: cp.set(s, 'panel_width', str(int(width)))
-            if height is not None: cp.set(s, 'panel_height', str(int(height)))
-            
-            # Handle other specific settings
-            keys_to_save = [
-                'panel_is_fullscreen', 'thumbnail_fit', 'thumbnail_size', 'theme', 
-                'export_format', 'export_include_meta', 'export_meta_method',
-                'search_text', 'search_scope_name', 'search_scope_prompt', 'search_scope_workflow',
-                'workflow_filter_internal', 'workflow_filter_external'
-            ]
-            for key in keys_to_save:
-                if key in data:
-                    cp.set(s, key, str(data[key]))
-
-            # Handle date keys separately for case consistency (JS: startDate, INI: startdate)
-            if 'startDate' in data:
-                cp.set(s, 'startdate', str(data['startDate']))
-            if 'endDate' in data:
-                cp.set(s, 'enddate', str(data['endDate']))
-            
-            # Handle list-type settings
-            if 'folder_filters' in data and isinstance(data['folder_filters'], list):
-                cp.set(s, 'folder_filters', json.dumps(data['folder_filters'])) # Store as JSON string
-            if 'format_filters' in data and isinstance(data['format_filters'], list):
-                cp.set(s, 'format_filters', json.dumps(data['format_filters'])) # Store as JSON string
-            # --- CORRECTIF : Ajouter la sauvegarde de locked_folders ---
-            if 'locked_folders' in data and isinstance(data['locked_folders'], list):
-                cp.set(s, 'locked_folders', json.dumps(data['locked_folders'])) # Store as JSON string
-
-            with open(holaf_config.get_config_path(), 'w') as cf: cp.write(cf)
-        reload_global_config() # Reload to reflect changes in the live CONFIG
-        return web.json_response({"status": "ok", "message": "Image Viewer settings saved."})
+        data = await request.json(loads=holaf_utils.loads_json)
+        s = 'ImageViewerUI'
+        updates = {} # INI key -> string value (None removes the option)
+        live_updates = {} # CONFIG['ui_image_viewer'] key -> typed value
+
+        # Consolidate panel dimension keys
+        pos_x = data.get('panel_x', data.get('x'))
+        pos_y = data.get('panel_y', data.get('y'))
+        width = data.get('panel_width', data.get('width'))
+        height = data.get('panel_height', data.get('height'))
+
+        # Handle panel position and size
+        live_updates['panel_x'] = int(pos_x) if pos_x is not None else None
+        live_updates['panel_y'] = int(pos_y) if pos_y is not None else None
+        if width is not None: live_updates['panel_width'] = int(width)
+        if height is not None: live_updates['panel_height'] = int(height)
+        for key, val in live_updates.items():
+            updates[key] = str(val) if val is not None else None
+        
+        # Handle other specific settings, typed as a reload of config.ini would give them
+        for key, value_type in IMAGE_VIEWER_UI_SETTING_TYPES:
+            if key in data:
+                val = data[key]
+                live_updates[key] = val if type(val) is value_type else value_type(val)
+                updates[key] = str(live_updates[key])
+
+        # Handle date keys separately for case consistency (JS: startDate, INI: startdate)
+        if 'startDate' in data:
+            updates['startdate'] = str(data['startDate'])
+            live_updates['startDate'] = str(data['startDate'])
+        if 'endDate' in data:
+            updates['enddate'] = str(data['endDate'])
+            live_updates['endDate'] = str(data['endDate'])
+        
+        # Handle list-type settings
+        for list_key in ('folder_filters', 'format_filters', 'locked_folders'):
+            if list_key in data and isinstance(data[list_key], list):
+                updates[list_key] = json.dumps(data[list_key]) # Store as JSON string
+                live_updates[list_key] = data[list_key]
+
+        # Live CONFIG is updated now; the disk write is debounced.
+        if CONFIG.get('ui_image_viewer') is not None: CONFIG['ui_image_viewer'].update(live_updates)
+        invalidate_settings_response()
+        holaf_config.queue_settings(s, updates)
+        return _json_response({"status": "ok", "message": "Image Viewer settings saved."})
     except Exception as e:
         print(f"🔴 Error saving IV UI settings: {e}"); traceback.print_exc()
-        return web.json_response({"status": "error", "message": str(e)}, status=500)
+        return _json_response({"status": "error", "message": str(e)}, status=500)
 
 # Nodes Manager Routes (thin wrappers, assuming nodes_manager_helper exists)
 if nodes_manager_helper:
@@ -943,14 +985,14 @@ if nodes_manager_helper:
         try:
             loop = asyncio.get_running_loop()
             node_list = await loop.run_in_executor(None, nodes_manager_helper.scan_custom_nodes)
-            return web.json_response({"nodes": node_list})
-        except Exception as e: print(f"🔴 [NM] Error list: {e}"); return web.json_response({"error":str(e)},500)
+            return _json_response({"nodes": node_list})
+        except Exception as e: print(f"🔴 [NM] Error list: {e}"); return _json_response({"error":str(e)},500)
 
     async def _handle_node_action_batch(request: web.Request, action_func_name: str):
         try:
-            data = await request.json()
+            data = await request.json(loads=holaf_utils.loads_json)
             payloads = data.get("node_payloads", data.get("node_names", [])) # Accept old and new payload keys
-            if not payloads: return web.json_response({"error": "No nodes specified"}, status=400)
+            if not payloads: return _json_response({"error": "No nodes specified"}, status=400)
 
             items_to_process = []
             # Standardize payload to a list of dicts
@@ -977,9 +1019,9 @@ if nodes_manager_helper:
             any_ok = any(r.get('status') == 'success' for r in results)
             http_status = 200 if all_ok else (207 if any_ok else 400) # 207 Multi-Status if some succeed
             overall_status = "ok" if all_ok else ("partial_success" if any_ok else "error")
-            return web.json_response({"status": overall_status, "details": results}, status=http_status)
+            return _json_response({"status": overall_status, "details": results}, status=http_status)
 
-        except Exception as e: print(f"🔴 [NM] Batch action error: {e}"); return web.json_response({"error":str(e)},500)
+        except Exception as e: print(f"🔴 [NM] Batch action error: {e}"); return _json_response({"error":str(e)},500)
 
     @routes.post("/holaf/nodes/update")
     async def nm_update_route(r): return await _handle_node_action_batch(r, "update_node_from_git")
@@ -1000,7 +1042,7 @@ if nodes_manager_helper:
     @routes.post("/holaf/nodes/readme/github")
     async def nm_get_github_readme(request: web.Request):
         try:
-            data = await request.json()
+            data = await request.json(loads=holaf_utils.loads_json)
             content = await nodes_manager_helper.get_github_readme_content(data.get("owner"), data.get("repo"))
             return web.Response(text=content, content_type='text/plain', charset='utf-8')
         except Exception as e: return web.Response(text=str(e), status=500)
@@ -1010,39 +1052,39 @@ if nodes_manager_helper:
         try:
             node_name = request.match_info.get('node_name', "")
             repo_url = await nodes_manager_helper.search_github_for_repo(node_name)
-            return web.json_response({"url": repo_url})
-        except Exception as e: return web.json_response({"error": str(e)}, status=500)
+            return _json_response({"url": repo_url})
+        except Exception as e: return _json_response({"error": str(e)}, status=500)
 
     # --- Node Manager Install & Search Routes ---
     @routes.post("/holaf/nodes/install")
     async def nm_install_route(request: web.Request):
         if nodes_manager_helper is None:
-            return web.json_response({"status": "error", "message": "Node manager module not available."}, status=503)
+            return _json_response({"status": "error", "message": "Node manager module not available."}, status=503)
         try:
-            data = await request.json()
+            data = await request.json(loads=holaf_utils.loads_json)
             url = data.get("url")
             if not url:
-                return web.json_response({"status": "error", "message": "URL is required."}, status=400)
+                return _json_response({"status": "error", "message": "URL is required."}, status=400)
             loop = asyncio.get_running_loop()
             result = await loop.run_in_executor(None, nodes_manager_helper.install_custom_node, url)
-            return web.json_response(result)
+            return _json_response(result)
         except Exception as e:
-            return web.json_response({"status": "error", "message": str(e)}, status=500)
+            return _json_response({"status": "error", "message": str(e)}, status=500)
 
     @routes.post("/holaf/nodes/search")
     async def nm_search_route(request: web.Request):
         if nodes_manager_helper is None:
-            return web.json_response({"status": "error", "message": "Node manager module not available."}, status=503)
+            return _json_response({"status": "error", "message": "Node manager module not available."}, status=503)
         try:
-            data = await request.json()
+            data = await request.json(loads=holaf_utils.loads_json)
             query = data.get("query")
             if not query:
-                return web.json_response({"status": "error", "message": "Query is required."}, status=400)
+                return _json_response({"status": "error", "message": "Query is required."}, status=400)
             loop = asyncio.get_running_loop()
             result = await loop.run_in_executor(None, nodes_manager_helper.search_custom_nodes, query)
-            return web.json_response(result)
+            return _json_response(result)
         except Exception as e:
-            return web.json_response({"status": "error", "message": str(e)}, status=500)
+            return _json_response({"status": "error", "message": str(e)}, status=500)
 
 
 # System Monitor Routes
@@ -1053,28 +1095,26 @@ async def holaf_monitor_websocket_route(request: web.Request):
 
 # --- Dynamic Node Loading from 'nodes/' directory ---
 NODE_CLASS_MAPPINGS, NODE_DISPLAY_NAME_MAPPINGS = {}, {}
-nodes_dir_path = os.path.join(os.path.dirname(__file__), "nodes")
+loaded_node_files = [] # Reported in a single line once the loop is done
+nodes_dir_path = os.path.join(EXTENSION_DIR, "nodes")
 if os.path.isdir(nodes_dir_path):
-    for filename in os.listdir(nodes_dir_path):
-        if filename.endswith(".py") and not filename.startswith("__"):
-            module_name = f"ComfyUI-Holaf-Utilities.nodes.{os.path.splitext(filename)[0]}"
-            full_module_path_for_spec = os.path.join(nodes_dir_path, filename)
-            try:
-                spec = importlib.util.spec_from_file_location(module_name, full_module_path_for_spec)
-                if spec and spec.loader:
-                    module = importlib.util.module_from_spec(spec)
-                    sys.modules[module_name] = module # Add to sys.modules before exec_module
-                    spec.loader.exec_module(module)
-                    if hasattr(module, "NODE_CLASS_MAPPINGS"):
-                        NODE_CLASS_MAPPINGS.update(module.NODE_CLASS_MAPPINGS)
-                        print(f"  > Loaded nodes from: {filename}")
-                    if hasattr(module, "NODE_DISPLAY_NAME_MAPPINGS"):
-                        NODE_DISPLAY_NAME_MAPPINGS.update(module.NODE_DISPLAY_NAME_MAPPINGS)
-                else:
-                    print(f"🔴 [Holaf-Init] Could not create spec for module: {filename}")
-            except Exception as e:
-                print(f"🔴 [Holaf-Init] Error loading node module {filename}: {e}", file=sys.stderr)
-                traceback.print_exc()
+    for module_info in pkgutil.iter_modules([nodes_dir_path]):
+        if module_info.name.startswith("__"):
+            continue
+        # Regular package import: helpers already imported above (model/nodes manager) come
+        # straight from sys.modules, and the import system handles bytecode caching.
+        try:
+            module = importlib.import_module(f".nodes.{module_info.name}", __package__)
+            if hasattr(module, "NODE_CLASS_MAPPINGS"):
+                NODE_CLASS_MAPPINGS.update(module.NODE_CLASS_MAPPINGS)
+                loaded_node_files.append(f"{module_info.name}.py")
+            if hasattr(module, "NODE_DISPLAY_NAME_MAPPINGS"):
+                NODE_DISPLAY_NAME_MAPPINGS.update(module.NODE_DISPLAY_NAME_MAPPINGS)
+        except Exception as e:
+            print(f"🔴 [Holaf-Init] Error loading node module {module_info.name}: {e}", file=sys.stderr)
+            traceback.print_exc()
+    if loaded_node_files:
+        print(f"  > Loaded nodes from: {', '.join(loaded_node_files)}")
 else:
     print("🟡 [Holaf-Init] 'nodes' directory not found. No additional custom nodes loaded.")
 
@@ -1145,10 +1185,36 @@ def start_filesystem_workers():
         print("🟡 [Holaf-Init] Filesystem Watcher workers already running.")
 # --- MODIFICATION END ---
 
+startup_call_handles = [] # Pending loop.call_later handles, cancelled on shutdown
+
+def _schedule_startup_call(delay_seconds, func):
+    """Runs func after a delay on the server loop instead of a Timer thread."""
+    def _run():
+        if stop_event.is_set(): return
+        try:
+            func()
+        except Exception as e:
+            print(f"🔴 [Holaf-Init] Error in startup call '{func.__name__}': {e}")
+            traceback.print_exc()
+    loop = getattr(server.PromptServer.instance, "loop", None)
+    if loop is None or loop.is_closed():
+        timer = threading.Timer(delay_seconds, _run) # No server loop: plain timer fallback
+        timer.daemon = True
+        timer.start()
+        return
+    loop.call_soon_threadsafe(lambda: startup_call_handles.append(loop.call_later(delay_seconds, _run)))
+
 
 def shutdown_tasks():
     print("🔵 [Holaf-Init] Signaling background tasks and workers to stop...")
     stop_event.set()
+    for handle in startup_call_handles:
+        handle.cancel()
+    MODEL_WORK_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    try:
+        holaf_config.flush_pending_settings_blocking() # Persist debounced UI settings
+    except Exception as e:
+        print(f"🔴 [Holaf-Init] Could not flush pending settings: {e}")
     print("🔵 [Holaf-Init] Shutdown signal process complete.")
 
 try:
@@ -1177,13 +1243,8 @@ else:
 _periodic_task_wrapper(30.0, holaf_image_viewer_backend.sync_image_database_blocking, initial_delay=10.0)
 
 # --- MODIFICATION START: Correctly schedule all image viewer workers ---
-thumbnail_startup_timer = threading.Timer(15.0, start_thumbnail_worker)
-thumbnail_startup_timer.daemon = True
-thumbnail_startup_timer.start()
-
-filesystem_startup_timer = threading.Timer(16.0, start_filesystem_workers)
-filesystem_startup_timer.daemon = True
-filesystem_startup_timer.start()
+_schedule_startup_call(15.0, start_thumbnail_worker)
+_schedule_startup_call(16.0, start_filesystem_workers)
 # --- MODIFICATION END ---
 
 
@@ -1,8 +1,8 @@
 # === Holaf Utilities Password Utility ===
 #
 # This script is used to generate a secure password hash for use in config.ini
-# for the Terminal utility. It uses PBKDF2 with a random salt, which is a
-# strong, standard practice for password storage.
+# for the Terminal utility. It uses scrypt with a random salt, a memory-hard
+# key derivation function suited to password storage.
 #
 # HOW TO USE:
 # 1. Navigate to your ComfyUI root directory in a terminal.
@@ -16,7 +16,7 @@
 #
 # Example `config.ini` entry:
 # [Security]
-# password_hash = 6e36...a1c3$b5a7...d9f4
+# password_hash = scrypt$n=32768,r=8,p=1$6e36...a1c3$b5a7...d9f4
 #
 import hashlib
 import os
@@ -45,14 +45,14 @@ def generate_password_hash():
     # Generate a random salt
     salt = os.urandom(16)
     
-    # Hash the password using PBKDF2
-    # PBKDF2 is recommended for password hashing as it is slow by design
-    iterations = 260000
-    dk = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    # Hash the password using scrypt (same parameters as holaf_terminal._hash_password)
+    # scrypt is memory-hard, which makes brute-forcing the hash expensive
+    n, r, p = 2**15, 8, 1
+    dk = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p, maxmem=64 * 1024 * 1024, dklen=32)
     
-    # Store the salt and hash together, separated by a '$'
+    # Store the parameters, salt and hash together, separated by '$'
     # This format makes it easy to verify later.
-    stored_hash = f"{salt.hex()}${dk.hex()}"
+    stored_hash = f"scrypt$n={n},r={r},p={p}${salt.hex()}${dk.hex()}"
     
     print("\n✅ Password hash generated successfully.")
     print("="*40)
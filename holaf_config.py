@@ -4,49 +4,117 @@ import os
 import platform
 import asyncio
 import re
+import shlex
 import traceback
 import json
+import copy
+import io
+import threading
 
-CONFIG_LOCK = asyncio.Lock()
+CONFIG_LOCK = threading.Lock() # Guards in-memory staging only, so it is never held across an await
 IS_WINDOWS = platform.system() == "Windows" # Needed for default shell
+_CONFIG_CACHE = None # (config.ini mtime_ns, parsed settings dict), see load_all_configs()
+CONFIG_FLUSH_DELAY = 0.5 # seconds, see queue_settings()
+_PENDING_SETTINGS = {} # (section, key) -> value (None removes the option), awaiting a debounced write
+_flush_task = None
+_CONFIG_PARSER = None # Canonical parser shared by all writers, see _get_canonical_parser()
+_CONFIG_PARSER_MTIME_NS = None # config.ini mtime when _CONFIG_PARSER was last read or written
+_CONFIG_WRITE_LOCK = threading.Lock() # Orders config.ini writes; held only by worker threads
+_config_staged_seq = 0 # Sequence number of the latest snapshot staged for writing
+_config_written_seq = 0 # Sequence number of the latest snapshot written (or failed)
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.ini')
 
 def get_config_path():
-    return os.path.join(os.path.dirname(__file__), 'config.ini')
+    return CONFIG_PATH
 
 def get_config_parser():
     config = configparser.ConfigParser()
     config.read(get_config_path())
     return config
 
+def _get_optional_int(config_parser_obj, section_name, key):
+    """ Returns the option as an int, or None if it is missing, empty or not a number. """
+    try:
+        return config_parser_obj.getint(section_name, key, fallback=None)
+    except ValueError:
+        return None
+
+def to_config_bool(value):
+    """ Converts a UI value to bool with getboolean's rules, so live CONFIG matches what a reload gives. """
+    if isinstance(value, str):
+        try:
+            return configparser.ConfigParser.BOOLEAN_STATES[value.lower()]
+        except KeyError:
+            raise ValueError(f"Not a boolean: {value!r}")
+    return bool(value)
+
 def _parse_panel_settings(config_parser_obj, section_name, defaults):
-    settings = {
+    return {
         'theme': config_parser_obj.get(section_name, 'theme', fallback=defaults.get('theme', 'Dark')),
-        'panel_x': config_parser_obj.get(section_name, 'panel_x', fallback=defaults.get('panel_x', None)),
-        'panel_y': config_parser_obj.get(section_name, 'panel_y', fallback=defaults.get('panel_y', None)),
+        'panel_x': _get_optional_int(config_parser_obj, section_name, 'panel_x'),
+        'panel_y': _get_optional_int(config_parser_obj, section_name, 'panel_y'),
         'panel_width': config_parser_obj.getint(section_name, 'panel_width', fallback=defaults.get('panel_width', 600)),
         'panel_height': config_parser_obj.getint(section_name, 'panel_height', fallback=defaults.get('panel_height', 400)),
         'panel_is_fullscreen': config_parser_obj.getboolean(section_name, 'panel_is_fullscreen', fallback=defaults.get('panel_is_fullscreen', False)),
     }
-    if settings['panel_x'] is not None:
-        try: settings['panel_x'] = int(settings['panel_x'])
-        except (ValueError, TypeError): settings['panel_x'] = None
-    else:
-        settings['panel_x'] = None
-    if settings['panel_y'] is not None:
-        try: settings['panel_y'] = int(settings['panel_y'])
-        except (ValueError, TypeError): settings['panel_y'] = None
-    else:
-        settings['panel_y'] = None
-    return settings
+
+def parse_password_hash(password_hash):
+    """
+    Decodes a stored password hash into (scheme, salt, key), or None if missing/malformed.
+    Formats: 'scrypt$n=N,r=R,p=P$salt_hex$key_hex' and the legacy PBKDF2 'salt_hex$key_hex'.
+    scheme is ('scrypt', n, r, p) or ('pbkdf2_sha256', iterations).
+    """
+    if not password_hash:
+        return None
+    try:
+        parts = password_hash.split('$')
+        if len(parts) == 2:
+            scheme = ('pbkdf2_sha256', 260000)
+            salt_hex, key_hex = parts
+        elif len(parts) == 4 and parts[0] == 'scrypt':
+            params = dict(item.split('=', 1) for item in parts[1].split(','))
+            scheme = ('scrypt', int(params['n']), int(params['r']), int(params['p']))
+            salt_hex, key_hex = parts[2], parts[3]
+        else:
+            return None
+        return scheme, bytes.fromhex(salt_hex), bytes.fromhex(key_hex)
+    except (ValueError, TypeError, KeyError):
+        return None
+
+def _get_config_mtime_ns():
+    try:
+        return os.stat(get_config_path()).st_mtime_ns
+    except OSError:
+        return None # No config.ini yet
+
+def invalidate_config_cache():
+    """ Forces the next load_all_configs() to re-parse config.ini. Call after writing it. """
+    global _CONFIG_CACHE
+    _CONFIG_CACHE = None
 
 def load_all_configs():
-    config_parser_obj = get_config_parser()
-    
+    """ Returns the parsed settings, re-parsing config.ini only when its mtime changed. """
+    global _CONFIG_CACHE
+    mtime_ns = _get_config_mtime_ns()
+    cached = _CONFIG_CACHE
+    if cached is None or cached[0] != mtime_ns:
+        cached = (mtime_ns, _parse_all_configs(get_config_parser()))
+        _CONFIG_CACHE = cached
+    # Callers mutate the returned dict (live CONFIG), so never hand out the cached one.
+    return copy.deepcopy(cached[1])
+
+def _parse_all_configs(config_parser_obj):
     default_shell = 'cmd.exe' if IS_WINDOWS else ('bash' if os.path.exists('/bin/bash') else 'sh')
     shell_cmd = config_parser_obj.get('Terminal', 'shell_command', fallback=default_shell)
+    try:
+        shell_cmd_list = shlex.split(shell_cmd)
+    except ValueError: # e.g. unbalanced quotes; let the terminal fail on the raw command instead
+        shell_cmd_list = [shell_cmd]
     password_hash = config_parser_obj.get('Security', 'password_hash', fallback=None)
     if not password_hash:
         password_hash = None
+    password_record = parse_password_hash(password_hash)
 
     ui_terminal_defaults = {'panel_width': 600, 'panel_height': 400}
     ui_settings_terminal = _parse_panel_settings(config_parser_obj, 'TerminalUI', ui_terminal_defaults)
@@ -113,7 +181,9 @@ def load_all_configs():
 
     return {
         'shell_command': shell_cmd,
+        'shell_cmd_list': shell_cmd_list, # shlex-split once here instead of per terminal session
         'password_hash': password_hash,
+        'password_record': password_record, # (scheme, salt, key) pre-decoded for the auth hot path
         'ui_terminal': ui_settings_terminal,
         'ui_model_manager': ui_settings_model_manager,
         'ui_image_viewer': ui_settings_image_viewer,
@@ -121,45 +191,183 @@ def load_all_configs():
         'monitor': monitor_settings
     }
 
-async def save_setting_to_config(section, key, value):
-    async with CONFIG_LOCK:
-        config_path = get_config_path()
-        config_parser_obj = get_config_parser()
-        
+def _read_canonical_parser():
+    """
+    Stats config.ini and parses it if it changed on disk (e.g. edited by hand) since we last
+    read or wrote it. Called without CONFIG_LOCK; the result goes to _stage_settings, which
+    installs the fresh parser under the lock.
+    """
+    staged_seq = _config_staged_seq
+    # While a staged snapshot is still being written, the parser is ahead of the file: keep it.
+    if _CONFIG_PARSER is not None and staged_seq != _config_written_seq:
+        return None
+    mtime_ns = _get_config_mtime_ns()
+    if _CONFIG_PARSER is not None and mtime_ns == _CONFIG_PARSER_MTIME_NS:
+        return None
+    return staged_seq, mtime_ns, get_config_parser()
+
+def _get_canonical_parser(fresh):
+    """
+    Returns the shared writer-side ConfigParser, first installing `fresh` (from
+    _read_canonical_parser) unless settings were staged since it was read. Callers hold CONFIG_LOCK.
+    """
+    global _CONFIG_PARSER, _CONFIG_PARSER_MTIME_NS
+    if fresh is not None:
+        staged_seq, mtime_ns, config_parser_obj = fresh
+        if staged_seq == _config_staged_seq: # Otherwise the in-memory parser is newer than that read
+            _CONFIG_PARSER, _CONFIG_PARSER_MTIME_NS = config_parser_obj, mtime_ns
+    if _CONFIG_PARSER is None:
+        # Only when a failed write dropped the parser after it was read: rare, so read under the lock.
+        _CONFIG_PARSER = get_config_parser()
+        _CONFIG_PARSER_MTIME_NS = _get_config_mtime_ns()
+    return _CONFIG_PARSER
+
+def _atomic_write_text(path, text):
+    """
+    Writes to a sibling temp file and renames it over `path`, so readers never see a half-written file.
+    A symlinked config.ini is followed (the link stays, its target is replaced) and the file's
+    permission bits are kept, since it holds the terminal password hash.
+    """
+    path = os.path.realpath(path)
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = None # New file: the umask applies, as with a plain open(path, 'w')
+    tmp_path = f"{path}.tmp"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666 if mode is None else mode)
+        with open(fd, 'w') as f:
+            if mode is not None:
+                os.chmod(tmp_path, mode) # Exact bits: the umask or a stale temp file may differ
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno()) # Data on disk before the rename, so a crash cannot leave an empty config
+        os.replace(tmp_path, path)
+    except BaseException:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+
+def _stage_settings(updates, fresh):
+    """
+    Applies {(section, key): value} to the canonical parser (a None value removes the option)
+    and returns a (seq, text) snapshot to hand to _write_snapshot_blocking, or None when every
+    value already matches (e.g. a re-sent panel position). Callers hold CONFIG_LOCK and pass
+    the result of _read_canonical_parser(), run before taking it, so the stat and any re-read
+    of config.ini happen outside the lock.
+    """
+    global _config_staged_seq
+    config_parser_obj = _get_canonical_parser(fresh)
+    changed = False
+    for (section, key), value in updates.items():
         if not config_parser_obj.has_section(section):
             config_parser_obj.add_section(section)
-        
+            changed = True
         if value is None:
             if config_parser_obj.has_option(section, key):
                 config_parser_obj.remove_option(section, key)
+                changed = True
         else:
-            config_parser_obj.set(section, str(key), str(value))
-            
-        with open(config_path, 'w') as configfile:
-            config_parser_obj.write(configfile)
+            key, value = str(key), str(value)
+            if config_parser_obj.get(section, key, raw=True, fallback=None) != value:
+                config_parser_obj.set(section, key, value)
+                changed = True
+    if not changed:
+        return None
+    # Serialize in memory so the file gets one write instead of many small ones.
+    buffer = io.StringIO()
+    config_parser_obj.write(buffer)
+    _config_staged_seq += 1
+    return _config_staged_seq, buffer.getvalue()
+
+def _write_snapshot_blocking(snapshot):
+    """ Writes a staged snapshot to config.ini unless a newer one already landed. Runs in a worker thread. """
+    global _CONFIG_PARSER, _CONFIG_PARSER_MTIME_NS, _config_written_seq
+    if snapshot is None:
+        return
+    seq, text = snapshot
+    with _CONFIG_WRITE_LOCK:
+        if seq <= _config_written_seq:
+            return # Superseded: a later snapshot (which includes these values) is already on disk
+        try:
+            _atomic_write_text(get_config_path(), text)
+            _CONFIG_PARSER_MTIME_NS = _get_config_mtime_ns()
+        except Exception:
+            _CONFIG_PARSER = None # Unsaved changes must not leak into the next write; re-read from disk
+            raise
+        finally:
+            _config_written_seq = max(_config_written_seq, seq)
+            invalidate_config_cache()
+
+def _take_pending_settings():
+    global _PENDING_SETTINGS
+    pending, _PENDING_SETTINGS = _PENDING_SETTINGS, {}
+    return pending
+
+def queue_settings(section, values):
+    """
+    Queues {key: value} for `section` and schedules a single debounced write of config.ini.
+    Panel drags/resizes fire many saves per second; only the latest values hit the disk.
+    Callers must update the live CONFIG themselves, since the file lags behind until the flush.
+    """
+    global _flush_task
+    if not values:
+        return
+    for key, value in values.items():
+        _PENDING_SETTINGS[(section, key)] = value
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.get_running_loop().create_task(_flush_pending_settings_later())
+
+async def _flush_pending_settings_later():
+    while True:
+        await asyncio.sleep(CONFIG_FLUSH_DELAY)
+        try:
+            fresh = await asyncio.to_thread(_read_canonical_parser)
+            with CONFIG_LOCK:
+                snapshot = _stage_settings(_take_pending_settings(), fresh)
+            await asyncio.to_thread(_write_snapshot_blocking, snapshot)
+        except Exception as e:
+            print(f"🔴 [Holaf-Config] Error writing queued settings to config.ini: {e}")
+            traceback.print_exc()
+        if not _PENDING_SETTINGS: # Settings queued during the write get another round
+            return
+
+def flush_pending_settings_blocking():
+    """ Writes queued settings immediately. Used at shutdown. """
+    fresh = _read_canonical_parser()
+    with CONFIG_LOCK:
+        snapshot = _stage_settings(_take_pending_settings(), fresh)
+    _write_snapshot_blocking(snapshot)
+
+async def save_setting_to_config(section, key, value):
+    fresh = await asyncio.to_thread(_read_canonical_parser)
+    with CONFIG_LOCK:
+        # Queued settings ride along in the same write so the file (and a subsequent reload) is complete.
+        updates = _take_pending_settings()
+        updates[(section, key)] = value
+        snapshot = _stage_settings(updates, fresh)
+    # Disk write runs in a worker thread, outside CONFIG_LOCK, so slow storage stalls neither
+    # the event loop nor other savers.
+    await asyncio.to_thread(_write_snapshot_blocking, snapshot)
 
 async def save_bulk_settings_to_config(settings_data):
     """ Saves multiple settings, typically from save-all-settings """
-    async with CONFIG_LOCK:
-        config_path = get_config_path()
-        config_parser_obj = get_config_parser()
+    fresh = await asyncio.to_thread(_read_canonical_parser)
+    with CONFIG_LOCK:
+        updates = _take_pending_settings()
 
         for section, settings in settings_data.items():
             if section == 'Security': continue # Never allow changing security from general save
             
-            if not config_parser_obj.has_section(section):
-                config_parser_obj.add_section(section)
-            
             if isinstance(settings, dict):
                 for key, value in settings.items():
                     safe_key = re.sub(r'[^a-zA-Z0-9_]', '', key)
                     if not safe_key: continue
                     
                     if value is None or str(value).strip() == '':
-                        if config_parser_obj.has_option(section, safe_key):
-                            config_parser_obj.remove_option(section, safe_key)
+                        updates[(section, safe_key)] = None
                     else:
-                         config_parser_obj.set(section, str(safe_key), str(value))
-        
-        with open(config_path, 'w') as configfile:
-            config_parser_obj.write(configfile)
\ No newline at end of file
+                        updates[(section, safe_key)] = value
+
+        snapshot = _stage_settings(updates, fresh)
+    await asyncio.to_thread(_write_snapshot_blocking, snapshot)
@@ -1,15 +1,15 @@
 # === Holaf Utilities - Terminal Manager ===
 import asyncio
+import concurrent.futures
 import hashlib
 import hmac
 import os
 import platform
-import shlex
 import sys
-import uuid
-import json
+import secrets
 import traceback
 import threading
+import time
 
 from aiohttp import web
 # Conditional imports for PTY
@@ -17,9 +17,13 @@ IS_WINDOWS = platform.system() == "Windows"
 if not IS_WINDOWS:
     try:
         import pty, termios, tty, fcntl, select, struct
+        TIOCSWINSZ = termios.TIOCSWINSZ
+        WINSIZE_STRUCT = struct.Struct('HHHH') # rows, cols, xpixel, ypixel
+        INITIAL_WINSIZE = WINSIZE_STRUCT.pack(24, 80, 0, 0) # Same 24x80 as the Windows spawn
     except ImportError:
         print("🔴 [Holaf-Terminal] Critical: pty/termios modules not found. Terminal will not work on non-Windows system.")
         pty = termios = tty = fcntl = select = struct = None 
+        TIOCSWINSZ = WINSIZE_STRUCT = INITIAL_WINSIZE = None
 else:
     try:
         from winpty import PtyProcess
@@ -29,27 +33,104 @@ else:
         PtyProcess = None
 
 from . import holaf_config # For config access if needed, or pass config values
+from . import holaf_utils
 
-SESSION_TOKENS = set() # Manages active terminal session tokens
+if sys.version_info >= (3, 12):
+    def _start_eager_task(coro):
+        """ Runs `coro` up to its first real suspension right away instead of on the next loop turn. """
+        return asyncio.Task(coro, loop=asyncio.get_running_loop(), eager_start=True)
+else:
+    _start_eager_task = asyncio.create_task
+
+SESSION_TOKENS = {} # Active terminal session tokens: token -> expiry (time.monotonic())
 SESSION_TOKENS_LOCK = threading.Lock() # Thread-safe access to SESSION_TOKENS
+SESSION_TOKEN_TTL = 60 # seconds
+SESSION_TOKEN_SWEEP_INTERVAL = 5 # seconds
+SESSION_TOKENS_MAX_SIZE = 1024 # Oldest tokens are evicted beyond this, bounding memory under auth floods
+_token_sweeper_task = None
+
+# Cache of recent successful verifications, so repeat logins skip the key derivation.
+# Keys are HMAC-SHA256(_VERIFY_PEPPER, salt + key + password): the pepper is ephemeral and
+# never leaves the process, so the cache is useless outside it and is lost on restart.
+_VERIFY_PEPPER = os.urandom(32)
+_VERIFY_CACHE = {} # cache_key -> expiry (time.monotonic())
+_VERIFY_CACHE_LOCK = threading.Lock()
+_VERIFY_CACHE_TTL = 300 # seconds
+_VERIFY_CACHE_MAX_SIZE = 1000
+
+PTY_READ_SIZE = 65536 # Bytes per PTY read
+PTY_COALESCE_LIMIT = 262144 # Max bytes merged into one queued chunk / WebSocket frame during output bursts
+PTY_QUEUE_MAXSIZE = 64 # Queued PTY chunks before reading pauses (backpressure for slow clients)
+PTY_BULK_FLUSH_DELAY = 0.016 # Seconds sustained output may accumulate before a frame is sent
 
 # --- Password Hashing and Verification ---
+# scrypt is memory-hard and runs in OpenSSL with the GIL released, so concurrent
+# hashing in worker threads scales across cores. Legacy PBKDF2 hashes still verify.
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2**15, 8, 1
+SCRYPT_MAXMEM = 64 * 1024 * 1024 # n=2**15, r=8 needs 32 MiB, which is exactly OpenSSL's default cap
+
+def _derive_key(scheme, password: str, salt: bytes, dklen: int) -> bytes:
+    if scheme[0] == 'scrypt':
+        _, n, r, p = scheme
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p, maxmem=SCRYPT_MAXMEM, dklen=dklen)
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, scheme[1])
+
 def _hash_password(password: str) -> str:
     salt = os.urandom(16)
-    iterations = 260000
-    dk = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
-    return f"{salt.hex()}${dk.hex()}"
+    dk = _derive_key(('scrypt', SCRYPT_N, SCRYPT_R, SCRYPT_P), password, salt, 32)
+    return f"scrypt$n={SCRYPT_N},r={SCRYPT_R},p={SCRYPT_P}${salt.hex()}${dk.hex()}"
 
-def _verify_password(stored_hash, provided_password):
-    if not stored_hash or not provided_password: return False
-    try:
-        salt_hex, key_hex = stored_hash.split('$')
-        salt = bytes.fromhex(salt_hex)
-        key = bytes.fromhex(key_hex)
-    except (ValueError, TypeError): return False
-    iterations = 260000
-    new_key = hashlib.pbkdf2_hmac('sha256', provided_password.encode('utf-8'), salt, iterations)
-    return hmac.compare_digest(new_key, key)
+def _verify_cache_key(salt, key, provided_password):
+    message = salt + key + b'\0' + provided_password.encode('utf-8')
+    return hmac.new(_VERIFY_PEPPER, message, hashlib.sha256).digest()
+
+def _verify_password(password_record, provided_password):
+    """ Checks a password against the pre-decoded (scheme, salt, key) of the stored hash. """
+    if not password_record or not provided_password: return False
+    scheme, salt, key = password_record
+    cache_key = _verify_cache_key(salt, key, provided_password)
+    now = time.monotonic()
+    with _VERIFY_CACHE_LOCK:
+        if _VERIFY_CACHE.get(cache_key, 0) > now:
+            return True
+    new_key = _derive_key(scheme, provided_password, salt, len(key))
+    if not hmac.compare_digest(new_key, key):
+        return False
+    with _VERIFY_CACHE_LOCK:
+        _VERIFY_CACHE.pop(cache_key, None)
+        while len(_VERIFY_CACHE) >= _VERIFY_CACHE_MAX_SIZE:
+            _VERIFY_CACHE.pop(next(iter(_VERIFY_CACHE))) # FIFO eviction (dicts keep insertion order)
+        _VERIFY_CACHE[cache_key] = time.monotonic() + _VERIFY_CACHE_TTL
+    return True
+
+# Key derivation is CPU-bound for tens of ms: run it off the event loop so other routes stay responsive.
+# A small dedicated pool keeps auth from queueing behind long scans in the default executor, and
+# caps how many 32 MiB scrypt derivations a burst of login attempts can run at once.
+_HASH_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='holaf-hash')
+
+async def _hash_password_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_HASH_EXECUTOR, _hash_password, password)
+
+async def _verify_password_async(password_record, provided_password):
+    return await asyncio.get_running_loop().run_in_executor(_HASH_EXECUTOR, _verify_password, password_record, provided_password)
+
+# --- Session Tokens ---
+async def _token_sweeper():
+    # One periodic sweep replaces a call_later timer (and closure) per issued token.
+    while True:
+        await asyncio.sleep(SESSION_TOKEN_SWEEP_INTERVAL)
+        now = time.monotonic()
+        with SESSION_TOKENS_LOCK:
+            for token in [t for t, expiry in SESSION_TOKENS.items() if expiry <= now]:
+                del SESSION_TOKENS[token]
+            if not SESSION_TOKENS:
+                return # Idle; restarted by the next auth
+
+def _ensure_token_sweeper():
+    # Started lazily from a route handler: at import time there is no running event loop.
+    global _token_sweeper_task
+    if _token_sweeper_task is None or _token_sweeper_task.done():
+        _token_sweeper_task = asyncio.get_running_loop().create_task(_token_sweeper())
 
 # --- Terminal Environment ---
 def is_running_in_conda():
@@ -60,74 +141,88 @@ def is_running_in_venv():
     venv_path = os.environ.get('VIRTUAL_ENV')
     return venv_path and sys.executable.startswith(os.path.normpath(venv_path))
 
+# The interpreter's environment cannot change for the process lifetime: classify it once.
+TERMINAL_ENV_KIND = 'conda' if is_running_in_conda() else ('venv' if is_running_in_venv() else 'system')
+
+def _apply_initial_termios(fd):
+    # Set terminal to raw mode and enable echo
+    attrs = termios.tcgetattr(fd)
+    attrs[3] &= ~termios.ICANON  # Disable canonical mode
+    attrs[3] |= termios.ECHO    # Enable echo
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+
 # --- API Route Handlers ---
 async def set_password_route(request: web.Request, global_app_config):
     # The lock is handled inside save_setting_to_config; removing it here prevents a deadlock.
     if global_app_config.get('password_hash'): 
-        return web.json_response({"status": "error", "message": "Password is already set."}, status=409)
+        return holaf_utils.json_response({"status": "error", "message": "Password is already set."}, status=409)
     try:
-        data = await request.json()
+        data = await request.json(loads=holaf_utils.loads_json)
         password = data.get('password')
         if not password or len(password) < 4:
-            return web.json_response({"status": "error", "message": "Password is too short."}, status=400)
+            return holaf_utils.json_response({"status": "error", "message": "Password is too short."}, status=400)
         
-        new_hash = _hash_password(password)
+        new_hash = await _hash_password_async(password)
         
         try:
             await holaf_config.save_setting_to_config('Security', 'password_hash', new_hash)
             global_app_config['password_hash'] = new_hash # Update live global config
+            global_app_config['password_record'] = holaf_config.parse_password_hash(new_hash)
             print("🔑 [Holaf-Terminal] A new password has been set and saved via the UI.")
-            return web.json_response({"status": "ok", "action": "reload"})
+            return holaf_utils.json_response({"status": "ok", "action": "reload"})
         except PermissionError:
             print("🔵 [Holaf-Terminal] A user tried to set a password, but file permissions prevented saving.")
-            return web.json_response({"status": "manual_required", "hash": new_hash, "message": "Could not save config.ini due to file permissions."}, status=200)
+            return holaf_utils.json_response({"status": "manual_required", "hash": new_hash, "message": "Could not save config.ini due to file permissions."}, status=200)
     except Exception as e:
         print(f"🔴 [Holaf-Terminal] Error setting password: {e}")
         traceback.print_exc()
-        return web.json_response({"status": "error", "message": str(e)}, status=500)
+        return holaf_utils.json_response({"status": "error", "message": str(e)}, status=500)
 
 async def auth_route(request: web.Request, global_app_config):
     if not global_app_config.get('password_hash'):
-        return web.json_response({"status": "error", "message": "Terminal is not configured. No password is set."}, status=503)
+        return holaf_utils.json_response({"status": "error", "message": "Terminal is not configured. No password is set."}, status=503)
     try:
-        data = await request.json()
+        data = await request.json(loads=holaf_utils.loads_json)
         password = data.get('password')
-        if _verify_password(global_app_config['password_hash'], password):
-            session_token = str(uuid.uuid4())
+        if await _verify_password_async(global_app_config.get('password_record'), password):
+            session_token = secrets.token_urlsafe(24) # URL-safe as-is for the ?token= query
             with SESSION_TOKENS_LOCK:
-                SESSION_TOKENS.add(session_token)
-            def cleanup_token(): # Runs in the event loop's thread
-                with SESSION_TOKENS_LOCK:
-                    SESSION_TOKENS.discard(session_token)
-            asyncio.get_running_loop().call_later(60, cleanup_token) # Token valid for 60s
-            return web.json_response({"status": "ok", "session_token": session_token})
+                while len(SESSION_TOKENS) >= SESSION_TOKENS_MAX_SIZE:
+                    SESSION_TOKENS.pop(next(iter(SESSION_TOKENS))) # Oldest first (dicts keep insertion order)
+                SESSION_TOKENS[session_token] = time.monotonic() + SESSION_TOKEN_TTL
+            _ensure_token_sweeper()
+            return holaf_utils.json_response({"status": "ok", "session_token": session_token})
         else:
-            return web.json_response({"status": "error", "message": "Invalid password."}, status=403)
+            return holaf_utils.json_response({"status": "error", "message": "Invalid password."}, status=403)
     except Exception as e:
-        return web.json_response({"status": "error", "message": str(e)}, status=400)
+        return holaf_utils.json_response({"status": "error", "message": str(e)}, status=400)
 
 async def websocket_handler(request: web.Request, global_app_config):
     session_token = request.query.get('token')
     with SESSION_TOKENS_LOCK:
-        if not session_token or session_token not in SESSION_TOKENS:
-            return web.Response(status=403, text="Invalid or expired session token")
-        SESSION_TOKENS.discard(session_token) # One-time use token
+        # One-time use token: pop it whether or not it is still valid
+        expiry = SESSION_TOKENS.pop(session_token, 0) if session_token else 0
+    if expiry <= time.monotonic():
+        return web.Response(status=403, text="Invalid or expired session token")
     
     ws = web.WebSocketResponse()
     await ws.prepare(request)
     print("🟢 [Holaf-Terminal] WebSocket connection opened and authenticated.")
     
     loop = asyncio.get_running_loop()
-    pty_queue = asyncio.Queue() # For data from PTY to WebSocket
+    pty_queue = asyncio.Queue(maxsize=PTY_QUEUE_MAXSIZE) # For data from PTY to WebSocket
+    session_closed = threading.Event() # Lets a reader thread blocked on a full queue give up
     
     proc_adapter = None # Will hold either WindowsPty or UnixPty instance
+    pty_fd = None # Unix only: PTY master fd registered with loop.add_reader
+    pty_reader_paused = False # Unix only: fd unregistered while the queue is full
     
     try:
         user_shell = global_app_config['shell_command']
         shell_cmd_list = []
         current_env = os.environ.copy()
 
-        if is_running_in_conda():
+        if TERMINAL_ENV_KIND == 'conda':
             conda_prefix = os.environ.get('CONDA_PREFIX')
             print(f"🔵 [Holaf-Terminal] Running in a Conda environment: {conda_prefix}")
             if IS_WINDOWS:
@@ -136,12 +231,12 @@ async def websocket_handler(request: web.Request, global_app_config):
             else: # Linux/macOS
                 cmd_string = f'eval "$(conda shell.bash hook)" && conda activate "{conda_prefix}" && exec {user_shell}'
                 shell_cmd_list = ['/bin/bash', '-c', cmd_string]
-        elif is_running_in_venv():
+        elif TERMINAL_ENV_KIND == 'venv':
             print(f"🔵 [Holaf-Terminal] Running in a Venv environment: {os.environ.get('VIRTUAL_ENV')}")
-            shell_cmd_list = shlex.split(user_shell)
+            shell_cmd_list = list(global_app_config['shell_cmd_list'])
         else:
             print(f"🔵 [Holaf-Terminal] Not in venv/conda. Using default shell for Python at: {sys.executable}")
-            shell_cmd_list = shlex.split(user_shell)
+            shell_cmd_list = list(global_app_config['shell_cmd_list'])
             # Cleanse Conda vars if present but not active, to avoid issues
             if 'CONDA_PREFIX' in current_env:
                 print("🔵 [Holaf-Terminal] Inherited Conda context detected. Cleansing environment.")
@@ -156,9 +251,22 @@ async def websocket_handler(request: web.Request, global_app_config):
                 return ws
             
             class WindowsPtyAdapter:
-                def __init__(self, p): self.pty_proc = p
-                def read(self, size): return self.pty_proc.read(size).encode('utf-8', errors='replace')
+                def __init__(self, p):
+                    self.pty_proc = p
+                def read(self, size):
+                    # Read raw bytes from the pty's socket, as PtyProcess.read does before decoding:
+                    # the bytes go straight into a binary frame, and xterm.js decodes UTF-8 split
+                    # across frames, so the str decode/encode round-trip is skipped.
+                    while True:
+                        data = self.pty_proc.fileobj.recv(size)
+                        if not data:
+                            self.pty_proc.flag_eof = True
+                            raise EOFError('Pty is closed')
+                        if data != b'0011Ignore': # winpty's placeholder message, dropped by PtyProcess.read too
+                            return data
                 def write(self, data_bytes): return self.pty_proc.write(data_bytes.decode('utf-8', errors='ignore'))
+                def write_text(self, text): return self.pty_proc.write(text) # TEXT frames are already str
+                async def drain(self): pass # Writes complete synchronously
                 def set_winsize(self, rows, cols): self.pty_proc.setwinsize(rows, cols)
                 def is_alive(self): return self.pty_proc.isalive()
                 def terminate(self, force=False): self.pty_proc.terminate(force)
@@ -180,14 +288,52 @@ async def websocket_handler(request: web.Request, global_app_config):
                 sys.exit(1) # Should not be reached
             
             class UnixPtyAdapter:
-                def __init__(self, p, f_descriptor):
+                def __init__(self, p, f_descriptor, event_loop):
                     self.pid = p
                     self.fd = f_descriptor
+                    self.loop = event_loop
+                    self.pending_input = bytearray() # Input the PTY did not accept yet
+                    self.drained = None # Future resolved once pending_input is flushed
                 def read(self, size): return os.read(self.fd, size)
-                def write(self, data_bytes): return os.write(self.fd, data_bytes)
+                def write(self, data_bytes):
+                    # The master fd is non-blocking (see add_reader below). Never wait for the shell
+                    # here: it may be blocked writing echo that only this loop's reader drains.
+                    # What the PTY cannot take now is flushed from an add_writer callback.
+                    if self.pending_input:
+                        self.pending_input += data_bytes
+                        return
+                    try:
+                        written = os.write(self.fd, data_bytes)
+                    except BlockingIOError:
+                        written = 0
+                    if written < len(data_bytes):
+                        self.pending_input += data_bytes[written:]
+                        self.loop.add_writer(self.fd, self._flush_pending_input)
+                def write_text(self, text): self.write(text.encode('utf-8'))
+                def _flush_pending_input(self):
+                    try:
+                        written = os.write(self.fd, self.pending_input)
+                    except BlockingIOError:
+                        return
+                    except OSError: # Shell gone: nothing will read the rest
+                        written = len(self.pending_input)
+                    del self.pending_input[:written]
+                    if not self.pending_input:
+                        self.discard_pending_input()
+                def discard_pending_input(self):
+                    self.loop.remove_writer(self.fd)
+                    self.pending_input.clear()
+                    if self.drained is not None and not self.drained.done():
+                        self.drained.set_result(None)
+                    self.drained = None
+                async def drain(self):
+                    # Lets the receiver stop reading the WebSocket until the shell catches up.
+                    if self.pending_input:
+                        if self.drained is None:
+                            self.drained = self.loop.create_future()
+                        await self.drained
                 def set_winsize(self, rows, cols):
-                    winsize = struct.pack('HHHH', rows, cols, 0, 0)
-                    fcntl.ioctl(self.fd, termios.TIOCSWINSZ, winsize)
+                    fcntl.ioctl(self.fd, TIOCSWINSZ, WINSIZE_STRUCT.pack(rows, cols, 0, 0))
                 def is_alive(self):
                     try:
                         os.kill(self.pid, 0)
@@ -201,43 +347,116 @@ async def websocket_handler(request: web.Request, global_app_config):
                         pass # Process already ended
             
             # Set initial window size and terminal attributes for the PTY master
-            initial_winsize_packed = struct.pack('HHHH', 24, 80, 0, 0)
-            fcntl.ioctl(fd, termios.TIOCSWINSZ, initial_winsize_packed)
-            
-            # Set terminal to raw mode and enable echo
-            attrs = termios.tcgetattr(fd)
-            attrs[3] &= ~termios.ICANON  # Disable canonical mode
-            attrs[3] |= termios.ECHO    # Enable echo
-            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+            fcntl.ioctl(fd, TIOCSWINSZ, INITIAL_WINSIZE)
+            _apply_initial_termios(fd)
             
-            proc_adapter = UnixPtyAdapter(pid, fd)
+            proc_adapter = UnixPtyAdapter(pid, fd, loop)
 
-        # Thread to read from PTY and put data into asyncio queue
-        def pty_reader_thread_target():
-            try:
-                while proc_adapter and proc_adapter.is_alive():
-                    data = proc_adapter.read(1024) # Read up to 1KB
-                    if not data: # PTY closed
+        if IS_WINDOWS:
+            def enqueue_blocking(item):
+                # Blocks the reader thread (and so the shell) while the queue is full.
+                future = asyncio.run_coroutine_threadsafe(pty_queue.put(item), loop)
+                while True:
+                    try:
+                        return future.result(timeout=0.5)
+                    except concurrent.futures.TimeoutError:
+                        if session_closed.is_set(): # Nobody is draining the queue anymore
+                            future.cancel()
+                            return
+
+            # Thread to read from PTY and put data into asyncio queue (pywinpty has no pollable fd)
+            def pty_reader_thread_target():
+                try:
+                    while proc_adapter and proc_adapter.is_alive():
+                        data = proc_adapter.read(PTY_READ_SIZE)
+                        if not data: # PTY closed
+                            break
+                        enqueue_blocking(data)
+                except (IOError, EOFError):
+                    pass # Expected when PTY closes
+                finally:
+                    enqueue_blocking(None) # Signal EOF to sender
+
+            # FIX: Create explicit Tasks for all three concurrent operations.
+            # Old code used `asyncio.gather()` with all three, but when the client
+            # disconnected, the PTY reader thread (blocked on os.read) and the sender
+            # task (blocked on queue.get) could never complete because the PTY was
+            # only terminated in the `finally` block AFTER `gather()` returned → deadlock.
+            reader_task = asyncio.create_task(asyncio.to_thread(pty_reader_thread_target))
+        else:
+            # The PTY master is a pollable fd: let the event loop watch it instead of
+            # running a reader thread that hands every chunk across threads.
+            pty_fd = proc_adapter.fd
+            reader_task = loop.create_future() # Resolved on PTY EOF
+
+            def on_pty_readable():
+                nonlocal pty_reader_paused
+                # Drain what is pending so an output burst becomes one queue item
+                # (one WebSocket frame) instead of many small ones.
+                chunks = []
+                total = 0
+                eof = False
+                while total < PTY_COALESCE_LIMIT:
+                    try:
+                        data = os.read(pty_fd, PTY_READ_SIZE)
+                    except BlockingIOError:
+                        break
+                    except OSError: # EIO once the shell has exited
+                        eof = True
                         break
-                    loop.call_soon_threadsafe(pty_queue.put_nowait, data)
-            except (IOError, EOFError):
-                pass # Expected when PTY closes
-            finally:
-                loop.call_soon_threadsafe(pty_queue.put_nowait, None) # Signal EOF to sender
-
-        # FIX: Create explicit Tasks for all three concurrent operations.
-        # Old code used `asyncio.gather()` with all three, but when the client
-        # disconnected, the PTY reader thread (blocked on os.read) and the sender
-        # task (blocked on queue.get) could never complete because the PTY was
-        # only terminated in the `finally` block AFTER `gather()` returned → deadlock.
-        reader_task = asyncio.create_task(asyncio.to_thread(pty_reader_thread_target))
+                    if not data:
+                        eof = True
+                        break
+                    chunks.append(data)
+                    total += len(data)
+                if chunks:
+                    pty_queue.put_nowait(chunks[0] if len(chunks) == 1 else b''.join(chunks))
+                if eof:
+                    loop.remove_reader(pty_fd)
+                    pty_reader_paused = False
+                    pty_queue.put_nowait(None) # Signal EOF to sender
+                    if not reader_task.done():
+                        reader_task.set_result(None)
+                elif pty_queue.qsize() >= PTY_QUEUE_MAXSIZE - 1:
+                    # Client is not keeping up: stop reading and let the kernel buffer fill,
+                    # which blocks the shell. One slot stays free for the EOF marker.
+                    loop.remove_reader(pty_fd)
+                    pty_reader_paused = True
+
+            os.set_blocking(pty_fd, False)
+            loop.add_reader(pty_fd, on_pty_readable)
 
         # Task to send data from queue to WebSocket
         async def pty_to_ws_sender():
-            while True:
+            nonlocal pty_reader_paused
+            eof = False
+            while not eof:
                 data = await pty_queue.get()
                 if data is None: # EOF signal
                     break
+                chunks = [data]
+                total = len(data)
+                waited = False
+                while True:
+                    # Fuse whatever else is already queued into the same WebSocket frame
+                    while total < PTY_COALESCE_LIMIT and not pty_queue.empty():
+                        more = pty_queue.get_nowait()
+                        if more is None:
+                            eof = True # Send what we have, then stop
+                            break
+                        chunks.append(more)
+                        total += len(more)
+                    if pty_reader_paused and pty_queue.qsize() <= PTY_QUEUE_MAXSIZE // 2:
+                        pty_reader_paused = False
+                        loop.add_reader(pty_fd, on_pty_readable)
+                    # Interactive echoes are small and go out at once. Sustained output (a full
+                    # read or more) waits one short interval for the rest instead of many frames.
+                    if waited or eof or total < PTY_READ_SIZE or total >= PTY_COALESCE_LIMIT:
+                        break
+                    waited = True
+                    await asyncio.sleep(PTY_BULK_FLUSH_DELAY)
+                if len(chunks) > 1:
+                    data = b''.join(chunks)
                 try:
                     await ws.send_bytes(data)
                 except ConnectionResetError:
@@ -245,29 +464,40 @@ async def websocket_handler(request: web.Request, global_app_config):
             if not ws.closed:
                 await ws.close()
 
-        sender_task = asyncio.create_task(pty_to_ws_sender())
+        sender_task = _start_eager_task(pty_to_ws_sender())
 
         # Task to receive data from WebSocket and write to PTY
         async def ws_to_pty_receiver():
             async for msg in ws:
                 if msg.type == web.WSMsgType.TEXT:
+                    # Control messages are JSON objects; keystrokes almost never start with '{',
+                    # so skip the parse attempt for ordinary input.
+                    if not msg.data.startswith('{'):
+                        if proc_adapter:
+                            proc_adapter.write_text(msg.data)
+                            await proc_adapter.drain()
+                        continue
                     try:
-                        data_json = json.loads(msg.data)
+                        data_json = holaf_utils.loads_json(msg.data)
                         if 'resize' in data_json and isinstance(data_json['resize'], list) and len(data_json['resize']) == 2:
                             rows, cols = data_json['resize']
                             if proc_adapter: proc_adapter.set_winsize(rows, cols)
                             print(f"🔵 [Holaf-Terminal] Resized to {rows}x{cols}")
                         # Could handle other JSON commands here
-                    except (json.JSONDecodeError, TypeError):
+                    except (ValueError, TypeError): # orjson/json decode errors are ValueErrors
                         # Not JSON, assume it's direct input for the terminal
-                        if proc_adapter: proc_adapter.write(msg.data.encode('utf-8'))
+                        if proc_adapter:
+                            proc_adapter.write_text(msg.data)
+                            await proc_adapter.drain()
                 elif msg.type == web.WSMsgType.BINARY:
-                    if proc_adapter: proc_adapter.write(msg.data)
+                    if proc_adapter:
+                        proc_adapter.write(msg.data)
+                        await proc_adapter.drain()
                 elif msg.type == web.WSMsgType.ERROR:
                     print(f'🔴 [Holaf-Terminal] WebSocket error: {ws.exception()}')
                     break
 
-        receiver_task = asyncio.create_task(ws_to_pty_receiver())
+        receiver_task = _start_eager_task(ws_to_pty_receiver())
 
         # FIX: Wait for ANY task to finish (client disconnect, PTY exit, or error),
         # then terminate the PTY and close the WebSocket to unblock remaining tasks.
@@ -275,6 +505,9 @@ async def websocket_handler(request: web.Request, global_app_config):
             [sender_task, receiver_task, reader_task],
             return_when=asyncio.FIRST_COMPLETED
         )
+        session_closed.set()
+        if pty_fd is not None:
+            proc_adapter.discard_pending_input() # Release a receiver waiting in drain()
 
         # Terminate PTY to unblock the reader thread (causes os.read to return)
         if proc_adapter and proc_adapter.is_alive():
@@ -300,6 +533,10 @@ async def websocket_handler(request: web.Request, global_app_config):
         traceback.print_exc()
     finally:
         print("⚫ [Holaf-Terminal] Cleaning up PTY session.")
+        session_closed.set()
+        if pty_fd is not None:
+            loop.remove_reader(pty_fd) # No-op if already removed on EOF
+            proc_adapter.discard_pending_input()
         # Tasks are cancelled implicitly if gather raises/finishes
         # Ensure PTY process is terminated
         # FIX: Wrap in try/except to handle NameError if proc_adapter or ws
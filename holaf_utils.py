@@ -4,6 +4,27 @@ import re
 import shutil
 import aiofiles
 import hashlib # MODIFIED: Added for checksum calculation
+import json
+from aiohttp import web
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --- JSON Serialization ---
+def dumps_json_bytes(data):
+    """ Serializes `data` to UTF-8 JSON bytes, using orjson when it is installed. """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS) # int keys, like json.dumps
+    return json.dumps(data).encode('utf-8')
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so existing handlers still match.
+loads_json = orjson.loads if orjson is not None else json.loads
+
+def json_response(data, status=200):
+    """ web.json_response equivalent that serializes with orjson when available. """
+    return web.Response(body=dumps_json_bytes(data), status=status, content_type='application/json')
 
 # --- Path and Filename Sanitization ---
 def sanitize_filename(filename):
@@ -232,16 +232,12 @@ async function downloadFile(manager, job) {
                     const chunkIndex = parallelQueue.shift();
                     if (chunkIndex === undefined) continue;
                     try {
-                        const response = await fetch('/holaf/models/download-chunk', {
-                            method: 'POST',
-                            headers: { 'Content-Type': 'application/json' },
-                            body: JSON.stringify({
-                                path: job.model.path,
-                                chunk_index: chunkIndex,
-                                chunk_size: manager.DOWNLOAD_CHUNK_SIZE,
-                            })
+                        const start = chunkIndex * manager.DOWNLOAD_CHUNK_SIZE;
+                        const end = Math.min(start + manager.DOWNLOAD_CHUNK_SIZE, job.model.size_bytes) - 1;
+                        const response = await fetch(`/holaf/models/download?path=${encodeURIComponent(job.model.path)}`, {
+                            headers: { 'Range': `bytes=${start}-${end}` }
                         });
-                        if (!response.ok) throw new Error(await response.text());
+                        if (response.status !== 206) throw new Error(await response.text() || `Unexpected status ${response.status}`);
                         
                         const chunkBlob = await response.blob();
                         job.chunksData[chunkIndex] = chunkBlob;
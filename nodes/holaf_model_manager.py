@@ -24,6 +24,7 @@ import traceback
 import re
 import hashlib
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 # Attempt to import safetensors, crucial for deep scan
 try:
@@ -44,6 +45,10 @@ EXTENSION_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 HOLAF_MODELS_DB_PATH = os.path.join(EXTENSION_BASE_DIR, '..', 'holaf_utilities.sqlite')
 MODEL_TYPES_CONFIG_PATH = os.path.join(EXTENSION_BASE_DIR, '..', 'model_types.json')
 
+COMFYUI_BASE_PATH_NORM = os.path.normpath(folder_paths.base_path) # Fixed once ComfyUI has parsed its args
+IS_WINDOWS_OS = os.name == 'nt'
+WINDOWS_DRIVE_PREFIX_RE = re.compile(r'^[A-Za-z]:')
+
 MODEL_TYPE_DEFINITIONS = []
 KNOWN_MODEL_EXTENSIONS = {'.safetensors', '.ckpt', '.pt', '.pth', '.bin', '.onnx'}
 
@@ -209,7 +214,7 @@ def scan_and_update_db():
                 # This function call now uses a non-existent schema from a previous version, simplifying to just insert if not present.
                 # A full refactor would merge this logic directly, but for now we focus on fixing the bug.
                 # The _process_model_item function is now simplified.
-                path_for_db = os.path.relpath(abs_fs_path, os.path.normpath(folder_paths.base_path)).replace(os.sep, '/')
+                path_for_db = os.path.relpath(abs_fs_path, COMFYUI_BASE_PATH_NORM).replace(os.sep, '/')
                 if path_for_db not in db_models_dict_canon_key:
                     model_family = _detect_model_family(item_name, model_type_key)
                     actual_size = os.path.getsize(abs_fs_path) if os.path.isfile(abs_fs_path) else 0
@@ -289,14 +294,15 @@ def get_all_models_from_db():
     finally:
         if conn: conn.close()
 
-def is_path_safe(path_from_client_canon: str, is_directory_model: bool = False) -> bool:
-    comfyui_base_path_norm = os.path.normpath(folder_paths.base_path)
-    is_client_path_intended_as_absolute = path_from_client_canon.startswith('/') or \
-                                          (os.name == 'nt' and len(path_from_client_canon) > 1 and path_from_client_canon[1] == ':' and path_from_client_canon[0].isalpha())
-    if not is_client_path_intended_as_absolute:
-        abs_path_to_check_norm = os.path.normpath(os.path.join(comfyui_base_path_norm, path_from_client_canon))
-    else:
-        abs_path_to_check_norm = os.path.normpath(path_from_client_canon)
+def resolve_client_model_path(path_from_client_canon: str) -> str:
+    """Maps a client path (relative to the ComfyUI base, or absolute) to a normalized absolute path."""
+    if path_from_client_canon.startswith('/') or \
+       (IS_WINDOWS_OS and WINDOWS_DRIVE_PREFIX_RE.match(path_from_client_canon) is not None):
+        return os.path.normpath(path_from_client_canon)
+    return os.path.normpath(os.path.join(COMFYUI_BASE_PATH_NORM, path_from_client_canon))
+
+def get_model_root_dirs():
+    """Returns the normcased absolute model roots known to ComfyUI. Compute once per batch of is_path_safe checks."""
     all_comfy_model_roots = set()
     if hasattr(folder_paths, 'models_dir') and folder_paths.models_dir:
         all_comfy_model_roots.add(os.path.normpath(folder_paths.models_dir))
@@ -308,11 +314,15 @@ def is_path_safe(path_from_client_canon: str, is_directory_model: bool = False)
                     all_comfy_model_roots.add(os.path.normpath(root_path))
     if not all_comfy_model_roots:
         all_comfy_model_roots.add(os.path.normpath(os.path.join(folder_paths.base_path, "models")))
+    return [os.path.normcase(os.path.abspath(root_model_dir_norm)) for root_model_dir_norm in all_comfy_model_roots]
+
+def is_path_safe(path_from_client_canon: str, is_directory_model: bool = False, model_root_dirs=None) -> bool:
+    abs_path_to_check_norm = resolve_client_model_path(path_from_client_canon)
+    if model_root_dirs is None:
+        model_root_dirs = get_model_root_dirs()
     is_safe = False
     normcased_abs_path_to_check = os.path.normcase(abs_path_to_check_norm)
-    for root_model_dir_norm in all_comfy_model_roots:
-        abs_root_model_dir_norm = os.path.abspath(root_model_dir_norm)
-        normcased_abs_root_model_dir = os.path.normcase(abs_root_model_dir_norm)
+    for normcased_abs_root_model_dir in model_root_dirs:
         if normcased_abs_path_to_check == normcased_abs_root_model_dir or \
            normcased_abs_path_to_check.startswith(normcased_abs_root_model_dir + os.sep):
             is_safe = True
@@ -321,44 +331,58 @@ def is_path_safe(path_from_client_canon: str, is_directory_model: bool = False)
         print(f"🔴 [Holaf-ModelManager] SECURITY: Path '{abs_path_to_check_norm}' (from client path '{path_from_client_canon}') was blocked as it is outside all recognized model directories.")
     return is_safe
 
+MAX_PARALLEL_DELETES = 8 # Overlaps unlink latency on slow or network-mounted model dirs
+
+def _remove_model_from_disk(abs_model_path):
+    """Removes a model file or directory. Returns (remove_db_row, error_message or None)."""
+    try:
+        if os.path.isfile(abs_model_path):
+            os.remove(abs_model_path)
+        elif os.path.isdir(abs_model_path):
+            shutil.rmtree(abs_model_path)
+        else:
+            return True, "File not found on disk." # Still remove the stale DB row
+    except OSError as e:
+        return False, f"Failed to delete file: {str(e)}"
+    return True, None
+
 def delete_models_from_db_and_disk(model_paths_canon: list):
     """Deletes model files from disk and their records from the database."""
     conn = None
-    comfyui_base_path_norm = os.path.normpath(folder_paths.base_path)
     results = {"deleted_count": 0, "errors": []}
     
     if not model_paths_canon:
         return results
     
     try:
-        conn = _get_db_connection()
-        cursor = conn.cursor()
-        
+        model_root_dirs = get_model_root_dirs() # Same roots for the whole batch
+        targets = [] # (path_canon, abs_model_path) that passed the security check
         for path_canon in model_paths_canon:
-            abs_model_path = os.path.normpath(os.path.join(comfyui_base_path_norm, path_canon))
-            
             # Security check
-            if not is_path_safe(path_canon, is_directory_model=False):
+            if not is_path_safe(path_canon, is_directory_model=False, model_root_dirs=model_root_dirs):
                 results["errors"].append({"path": path_canon, "message": "Path is outside allowed model directories."})
                 continue
-            
-            try:
-                if os.path.isfile(abs_model_path):
-                    os.remove(abs_model_path)
-                elif os.path.isdir(abs_model_path):
-                    shutil.rmtree(abs_model_path)
-                else:
-                    results["errors"].append({"path": path_canon, "message": "File not found on disk."})
-                    # Still try to remove from DB
-                    
-                cursor.execute("DELETE FROM models WHERE path_canon = ?", (path_canon,))
-                if cursor.rowcount > 0:
-                    results["deleted_count"] += 1
-                    
-            except OSError as e:
-                results["errors"].append({"path": path_canon, "message": f"Failed to delete file: {str(e)}"})
+            targets.append((path_canon, resolve_client_model_path(path_canon)))
         
-        conn.commit()
+        if len(targets) > 1:
+            with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_DELETES, len(targets))) as pool:
+                outcomes = list(pool.map(_remove_model_from_disk, [abs_path for _, abs_path in targets]))
+        else:
+            outcomes = [_remove_model_from_disk(abs_path) for _, abs_path in targets]
+        
+        db_rows_to_delete = [] # (path_canon,) for one executemany after the disk work
+        for (path_canon, _), (remove_db_row, error_message) in zip(targets, outcomes):
+            if error_message:
+                results["errors"].append({"path": path_canon, "message": error_message})
+            if remove_db_row:
+                db_rows_to_delete.append((path_canon,))
+        
+        if db_rows_to_delete:
+            conn = _get_db_connection()
+            cursor = conn.cursor()
+            cursor.executemany("DELETE FROM models WHERE path_canon = ?", db_rows_to_delete)
+            results["deleted_count"] = cursor.rowcount # Total rows removed across the batch
+            conn.commit()
     except sqlite3.Error as e:
         results["errors"].append({"path": "N/A", "message": f"Database error during deletion: {str(e)}"})
         if conn: conn.rollback()
@@ -406,7 +430,7 @@ def _perform_local_deep_scan_for_model(model_abs_fs_path: str) -> dict:
 
 def process_deep_scan_request(model_paths_from_client_canon: list): 
     conn = None
-    comfyui_base_path_norm = os.path.normpath(folder_paths.base_path)
+    comfyui_base_path_norm = COMFYUI_BASE_PATH_NORM
     results = {"updated_count": 0, "errors": []}
     if not model_paths_from_client_canon:
         results["errors"].append({"path": "N/A", "message": "No model paths provided."})